@@ -0,0 +1,116 @@
+import hashlib
+import json
+import struct
+
+# A hash scheme is "<encoding>-<algorithm>": how a block's fields are
+# turned into bytes, and which hash function is run over those bytes.
+# "json-sha256" is what every chain used before schemes existed, so it
+# stays the default and blocks using it don't record their scheme.
+DEFAULT_SCHEME = "json-sha256"
+
+# Payload fields of a DSCSA unit, in the order the struct encoding uses
+DSCSA_FIELDS = ("barcode_string", "gtin", "serial", "lot", "exp", "status")
+_DSCSA_KEYS = frozenset(DSCSA_FIELDS)
+
+# One shared encoder for every block. sort_keys + ensure_ascii=False gives
+# exactly the same text as json.dumps(block_content, sort_keys=True,
+# ensure_ascii=False), the original Block.compute_hash encoding.
+JSON_ENCODER = json.JSONEncoder(sort_keys=True, ensure_ascii=False)
+encode_string = json.encoder.encode_basestring
+
+if json.encoder.c_make_encoder is not None:
+    # JSONEncoder.encode() builds a new C encoder on every call, which
+    # costs more than the encoding itself for one small block. Build it
+    # once instead (no circular-reference check: block data is plain JSON).
+    _c_encoder = json.encoder.c_make_encoder(
+        None, JSON_ENCODER.default, encode_string, None,
+        ": ", ", ", True, False, True,
+    )
+
+    def encode_value(value):
+        return "".join(_c_encoder(value, 0))
+else:
+    encode_value = JSON_ENCODER.encode
+
+
+def block_content_string(index, timestamp, data, previous_hash, nonce):
+    # Canonical JSON text of a block
+    return encode_value({
+        "index": index,
+        "timestamp": timestamp,
+        "data": data,
+        "previous_hash": previous_hash,
+        "nonce": nonce,
+    })
+
+
+def encode_json(index, timestamp, data, previous_hash, nonce):
+    return block_content_string(index, timestamp, data, previous_hash, nonce).encode("utf-8")
+
+
+_STRUCT_HEADER = struct.Struct("<qdqB")
+_DSCSA_LENGTHS = struct.Struct("<%dI" % (1 + len(DSCSA_FIELDS)))
+_FALLBACK_LENGTHS = struct.Struct("<2I")
+
+
+def encode_struct(index, timestamp, data, previous_hash, nonce):
+    # Fixed binary layout: index, timestamp and nonce packed as int64 /
+    # float64 / int64 and a tag byte, then the byte length of each string
+    # field, then the strings themselves (previous_hash followed by the
+    # DSCSA fields in DSCSA_FIELDS order) as UTF-8. Payloads that aren't
+    # exactly the DSCSA fields (e.g. the genesis block) store canonical
+    # JSON of the data instead, marked by a different tag byte.
+    if (type(data) is dict and data.keys() == _DSCSA_KEYS
+            and all(type(value) is str for value in data.values())):
+        strings = [previous_hash.encode("utf-8")]
+        strings.extend(data[field].encode("utf-8") for field in DSCSA_FIELDS)
+        return (
+            _STRUCT_HEADER.pack(index, timestamp, nonce, 1)
+            + _DSCSA_LENGTHS.pack(*map(len, strings))
+            + b"".join(strings)
+        )
+
+    strings = (previous_hash.encode("utf-8"), encode_value(data).encode("utf-8"))
+    return (
+        _STRUCT_HEADER.pack(index, timestamp, nonce, 0)
+        + _FALLBACK_LENGTHS.pack(*map(len, strings))
+        + b"".join(strings)
+    )
+
+
+def _blake2b(data=b""):
+    # 32-byte digests, so blocks fit the same 32-byte hash slots
+    return hashlib.blake2b(data, digest_size=32)
+
+
+ENCODINGS = {
+    "json": encode_json,
+    "struct": encode_struct,
+}
+
+ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": _blake2b,
+}
+
+# Every "<encoding>-<algorithm>" combination
+HASH_SCHEMES = {
+    f"{encoding}-{algorithm}": (ENCODINGS[encoding], ALGORITHMS[algorithm])
+    for encoding in ENCODINGS
+    for algorithm in ALGORITHMS
+}
+
+
+def get_scheme(scheme):
+    # (encode, algorithm) for a scheme name like "struct-blake2b"
+    try:
+        return HASH_SCHEMES[scheme]
+    except KeyError:
+        raise ValueError(
+            f"unknown hash scheme {scheme!r}, expected one of {list(HASH_SCHEMES)}"
+        ) from None
+
+
+def compute_block_hash(index, timestamp, data, previous_hash, nonce, scheme=DEFAULT_SCHEME):
+    encode, algorithm = get_scheme(scheme)
+    return algorithm(encode(index, timestamp, data, previous_hash, nonce)).hexdigest()
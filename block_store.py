@@ -0,0 +1,281 @@
+from array import array
+from multiprocessing import shared_memory
+
+# Size of a SHA-256 digest in bytes
+HASH_SIZE = 32
+
+
+def hex_to_digest(value):
+    # Turn a 64-character lowercase hex hash into its 32 raw bytes.
+    # Returns None for anything else (e.g. the genesis previous_hash "0"),
+    # so the caller can keep that value as-is instead.
+    if type(value) is not str or len(value) != HASH_SIZE * 2:
+        return None
+    try:
+        digest = bytes.fromhex(value)
+    except ValueError:
+        return None
+    # fromhex also accepts upper case, but then .hex() would give back
+    # a different string than the one that was hashed
+    if digest.hex() != value:
+        return None
+    return digest
+
+
+class _EncodedValues:
+    # Read-only stand-in for BlockStore._values when the value table lives
+    # in shared memory: one UTF-8 blob plus an array of end offsets
+
+    def __init__(self, blob, ends):
+        self._blob = blob
+        self._ends = ends
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, code):
+        start = self._ends[code - 1] if code else 0
+        return str(self._blob[start:self._ends[code]], "utf-8")
+
+
+class BlockStore:
+    """Compact column storage for the blocks of a Chain.
+
+    Instead of one Python object per block, every field lives in a
+    contiguous buffer:
+
+    - hashes as 32-byte digests in one bytearray
+    - timestamps and nonces in typed arrays
+    - payload dictionaries as one array of codes per key, pointing into
+      a shared table of interned string values
+
+    The block index is the position in the store, and previous_hash is
+    the hash of the block before it. Anything that doesn't fit that
+    layout (the genesis previous_hash "0", non-string payload values,
+    integer timestamps from an old export...) is kept as-is in a small
+    overrides dictionary so it comes back out exactly as it went in.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._hashes = bytearray()
+        self._timestamps = array("d")
+        self._nonces = array("q")
+
+        # Payload columns: schema_ids[i] says which tuple of keys block i
+        # has, and columns[key][i] is the code of its value in _values
+        self._schema_ids = array("i")
+        self._schemas = []
+        self._schema_lookup = {}
+        self._columns = {}
+        self._values = []
+        self._value_codes = {}
+
+        # {position: {field: value}} for values stored as plain objects
+        self._overrides = {}
+
+    def __len__(self):
+        return self._count
+
+    def schema_id(self, keys):
+        # Return the id for this tuple of payload keys, adding it if new
+        keys = tuple(keys)
+        schema_id = self._schema_lookup.get(keys)
+        if schema_id is None:
+            schema_id = len(self._schemas)
+            self._schemas.append(keys)
+            self._schema_lookup[keys] = schema_id
+            for key in keys:
+                if key not in self._columns:
+                    # Earlier blocks never had this key, pad with zeros
+                    self._columns[key] = array("I", bytes(4 * self._count))
+        return schema_id
+
+    def _value_code(self, value):
+        code = self._value_codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._values.append(value)
+            self._value_codes[value] = code
+        return code
+
+    def append(self, index, timestamp, data, previous_hash, nonce, hash):
+        # Payloads that are flat dictionaries of strings are split into
+        # columns, anything else is stored whole
+        if type(data) is dict and all(
+            type(key) is str and type(value) is str for key, value in data.items()
+        ):
+            schema_id = self.schema_id(data.keys())
+            self.append_values(
+                index, timestamp, schema_id, tuple(data.values()),
+                previous_hash, nonce, hash,
+            )
+            return
+
+        self.append_values(index, timestamp, -1, (), previous_hash, nonce, hash)
+        self._overrides.setdefault(self._count - 1, {})["data"] = data
+
+    def append_values(self, index, timestamp, schema_id, values, previous_hash, nonce, hash):
+        # Append a block whose payload values are given in the key order
+        # of schema_id (-1 means "no columns", used by append above)
+        position = self._count
+        overrides = {}
+
+        if index != position:
+            overrides["index"] = index
+
+        if type(timestamp) is float:
+            self._timestamps.append(timestamp)
+        else:
+            self._timestamps.append(0.0)
+            overrides["timestamp"] = timestamp
+
+        if type(nonce) is int and -(2 ** 63) <= nonce < 2 ** 63:
+            self._nonces.append(nonce)
+        else:
+            self._nonces.append(0)
+            overrides["nonce"] = nonce
+
+        digest = hex_to_digest(hash)
+        if digest is None:
+            self._hashes += bytes(HASH_SIZE)
+            overrides["hash"] = hash
+        else:
+            self._hashes += digest
+
+        # previous_hash costs nothing when it simply points at the block
+        # before (the normal case), otherwise it is kept as an override
+        if position == 0 or previous_hash != self.hash_hex(position - 1):
+            overrides["previous_hash"] = previous_hash
+
+        self._schema_ids.append(schema_id)
+        keys = self._schemas[schema_id] if schema_id >= 0 else ()
+        codes = dict(zip(keys, values))
+        for key, column in self._columns.items():
+            value = codes.get(key)
+            column.append(0 if value is None else self._value_code(value))
+
+        if overrides:
+            self._overrides[position] = overrides
+        self._count += 1
+
+    def _position(self, position):
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("block index out of range")
+        return position
+
+    def hash_digest(self, position):
+        # Raw 32-byte digest (all zeros if the hash was not a normal digest)
+        position = self._position(position)
+        start = position * HASH_SIZE
+        return bytes(self._hashes[start:start + HASH_SIZE])
+
+    def hash_hex(self, position):
+        position = self._position(position)
+        override = self._overrides.get(position)
+        if override is not None and "hash" in override:
+            return override["hash"]
+        start = position * HASH_SIZE
+        return self._hashes[start:start + HASH_SIZE].hex()
+
+    def previous_hash(self, position):
+        position = self._position(position)
+        override = self._overrides.get(position)
+        if override is not None and "previous_hash" in override:
+            return override["previous_hash"]
+        return self.hash_hex(position - 1)
+
+    def data(self, position):
+        position = self._position(position)
+        override = self._overrides.get(position)
+        if override is not None and "data" in override:
+            return override["data"]
+        values = self._values
+        return {
+            key: values[self._columns[key][position]]
+            for key in self._schemas[self._schema_ids[position]]
+        }
+
+    def fields(self, position):
+        # All six block fields as a tuple:
+        # (index, timestamp, data, previous_hash, nonce, hash)
+        position = self._position(position)
+        override = self._overrides.get(position, {})
+        return (
+            override.get("index", position),
+            override.get("timestamp", self._timestamps[position]),
+            self.data(position),
+            self.previous_hash(position),
+            override.get("nonce", self._nonces[position]),
+            self.hash_hex(position),
+        )
+
+    def to_shared_memory(self):
+        # Copy every buffer of the store into one SharedMemory block so
+        # worker processes can read the chain without pickling it.
+        # Returns (shm, layout); the caller must close() and unlink() shm.
+        value_bytes = [value.encode("utf-8") for value in self._values]
+        value_ends = array("Q")
+        end = 0
+        for encoded in value_bytes:
+            end += len(encoded)
+            value_ends.append(end)
+
+        column_keys = list(self._columns)
+        buffers = [
+            ("hashes", self._hashes, "B"),
+            ("timestamps", self._timestamps, "d"),
+            ("nonces", self._nonces, "q"),
+            ("schema_ids", self._schema_ids, "i"),
+            ("value_ends", value_ends, "Q"),
+            ("value_blob", b"".join(value_bytes), "B"),
+        ]
+        buffers += [("column:" + key, self._columns[key], "I") for key in column_keys]
+
+        # Lay the buffers out one after another, 8-byte aligned
+        offsets = {}
+        size = 0
+        for name, buffer, fmt in buffers:
+            length = memoryview(buffer).nbytes
+            offsets[name] = (size, length, fmt)
+            size += (length + 7) // 8 * 8
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, buffer, fmt in buffers:
+            start, length, fmt = offsets[name]
+            shm.buf[start:start + length] = memoryview(buffer).cast("B")
+
+        layout = {
+            "count": self._count,
+            "offsets": offsets,
+            "schemas": self._schemas,
+            "column_keys": column_keys,
+            "overrides": self._overrides,
+        }
+        return shm, layout
+
+    @classmethod
+    def attach_shared_memory(cls, name, layout):
+        # Open a read-only store over a block made by to_shared_memory().
+        # Returns (store, shm); keep shm referenced while using the store.
+        shm = shared_memory.SharedMemory(name=name)
+
+        def view(name):
+            start, length, fmt = layout["offsets"][name]
+            return shm.buf[start:start + length].cast(fmt)
+
+        store = cls.__new__(cls)
+        store._count = layout["count"]
+        store._hashes = view("hashes")
+        store._timestamps = view("timestamps")
+        store._nonces = view("nonces")
+        store._schema_ids = view("schema_ids")
+        store._schemas = layout["schemas"]
+        store._schema_lookup = {}
+        store._columns = {key: view("column:" + key) for key in layout["column_keys"]}
+        store._values = _EncodedValues(view("value_blob"), view("value_ends"))
+        store._value_codes = {}
+        store._overrides = layout["overrides"]
+        return store, shm
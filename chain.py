@@ -1,17 +1,155 @@
 import hashlib
-import json
+import hmac
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+from block_hashing import (
+    DEFAULT_SCHEME,
+    compute_block_hash,
+    encode_string,
+    encode_value,
+    get_scheme,
+)
+from block_store import BlockStore
+from chain_export import ChainJSONWriter
+from chain_index import ChainIndex
+from ledger_file import LedgerReader, LedgerWriter
+from merkle import MerkleTree, leaf_hash, verify_path
+from verification import block_hash, iter_issues
+
+# Read-only store used inside validate_parallel worker processes
+_worker_store = None
+_worker_shm = None
+_worker_scheme = DEFAULT_SCHEME
+
+
+def _attach_worker_store(name, layout, hash_scheme):
+    global _worker_store, _worker_shm, _worker_scheme
+    _worker_store, _worker_shm = BlockStore.attach_shared_memory(name, layout)
+    _worker_scheme = hash_scheme
+
+
+def _open_worker_ledger(path, hash_scheme):
+    # Each worker maps the ledger file itself; the OS shares the pages
+    global _worker_store, _worker_scheme
+    _worker_store = LedgerReader(path, use_mmap=True)
+    _worker_scheme = hash_scheme
+
+
+def _issues_in_range(store, start, end, check_first_link=True, counters=None,
+                     hash_scheme=DEFAULT_SCHEME):
+    # See verification.iter_issues; reads the blocks straight from the store
+    return iter_issues(
+        store.fields, store.hash_hex, start, end, hash_scheme,
+        check_first_link=check_first_link, counters=counters,
+    )
+
+
+def _failing_in_range(store, start, end, hash_scheme=DEFAULT_SCHEME):
+    # Positions in [start, end) with a bad hash or a bad link.
+    # The link of `start` itself is left to the caller (shard boundary).
+    failing = []
+    issues = _issues_in_range(
+        store, start, end, check_first_link=False, hash_scheme=hash_scheme
+    )
+    for i, error in issues:
+        if not failing or failing[-1] != i:
+            failing.append(i)
+    return failing
+
+
+def _worker_failing_in_range(start, end):
+    return _failing_in_range(_worker_store, start, end, _worker_scheme)
+
+
+def verify_proof(proof, root):
+    # Check a proof from Chain.prove(): the block's hash must match its
+    # content, and its Merkle path must lead to the trusted root
+    block = proof["block"]
+    if block_hash(block) != block["hash"]:
+        return False
+    return verify_path(block["hash"], proof["path"], root)
+
+
+def _block_dict(index, timestamp, data, previous_hash, nonce, hash,
+                hash_scheme=DEFAULT_SCHEME):
+    # Same dictionary as Block.to_dict(), without making a Block
+    block = {
+        "index": index,
+        "timestamp": timestamp,
+        "data": data,
+        "previous_hash": previous_hash,
+        "nonce": nonce,
+        "hash": hash,
+    }
+    if hash_scheme != DEFAULT_SCHEME:
+        block["hash_scheme"] = hash_scheme
+    return block
+
+
+class VerificationReport:
+    # Result of Chain.verify(): every problem found in one pass over the
+    # chain, plus how long the pass took
+
+    def __init__(self):
+        self.broken_links = []
+        self.hash_mismatches = []
+        self.blocks_checked = 0
+        self.bytes_hashed = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def is_valid(self):
+        return not self.broken_links and not self.hash_mismatches
+
+    @property
+    def blocks_per_sec(self):
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.blocks_checked / self.elapsed_seconds
+
+    def corrupted_spans(self):
+        # Group every failing index into contiguous (first, last) ranges
+        spans = []
+        for index in sorted(set(self.broken_links) | set(self.hash_mismatches)):
+            if spans and spans[-1][1] == index - 1:
+                spans[-1] = (spans[-1][0], index)
+            else:
+                spans.append((index, index))
+        return spans
+
+    def to_dict(self):
+        return {
+            "is_valid": self.is_valid,
+            "broken_links": self.broken_links,
+            "hash_mismatches": self.hash_mismatches,
+            "corrupted_spans": self.corrupted_spans(),
+            "blocks_checked": self.blocks_checked,
+            "bytes_hashed": self.bytes_hashed,
+            "elapsed_seconds": self.elapsed_seconds,
+            "blocks_per_sec": self.blocks_per_sec,
+        }
 
 
 class Block:
+    # No per-instance __dict__: blocks are small and created in bulk
+    __slots__ = (
+        "index", "timestamp", "data", "previous_hash", "nonce", "hash", "hash_scheme",
+    )
 
-    def __init__(self, index, data, previous_hash, nonce=0, timestamp=None):
+    def __init__(self, index, data, previous_hash, nonce=0, timestamp=None,
+                 hash_scheme=DEFAULT_SCHEME):
         # Set the basic properties
         self.index = index
         self.data = data
         self.previous_hash = previous_hash
         self.nonce = nonce
 
+        # Which encoding + hash function this block's hash uses
+        # (see block_hashing.py), e.g. "json-sha256" or "struct-blake2b"
+        self.hash_scheme = hash_scheme
+
         # If no timestamp is given, use the current time
         if timestamp is None:
             self.timestamp = time.time()
@@ -22,51 +160,197 @@ class Block:
         self.hash = self.compute_hash()
 
     def compute_hash(self):
+        # Encode the important fields and hash them with this block's scheme.
+        # The default "json-sha256" scheme is SHA-256 of
+        # json.dumps({...}, sort_keys=True, ensure_ascii=False).
+        return compute_block_hash(
+            self.index, self.timestamp, self.data,
+            self.previous_hash, self.nonce, self.hash_scheme,
+        )
 
-        # Put the important fields into a dictionary
-        block_content = {
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce,
-        }
+    @classmethod
+    def from_fields(cls, index, timestamp, data, previous_hash, nonce, hash,
+                    hash_scheme=DEFAULT_SCHEME):
+        # Rebuild a block whose hash is already known (bulk builds, loading
+        # from storage) without hashing it a second time
+        block = cls.__new__(cls)
+        block.hash_scheme = hash_scheme
+        block.index = index
+        block.timestamp = timestamp
+        block.data = data
+        block.previous_hash = previous_hash
+        block.nonce = nonce
+        block.hash = hash
+        return block
 
-        # Turn the dictionary into a JSON string
-        # sort_keys=True makes the JSON ordering consistent
-        block_string = json.dumps(block_content, sort_keys=True, ensure_ascii=False)
+    def to_dict(self):
 
-        # Encode to bytes and run SHA-256
-        hash_object = hashlib.sha256(block_string.encode("utf-8"))
-        return hash_object.hexdigest()
+        return _block_dict(
+            self.index, self.timestamp, self.data,
+            self.previous_hash, self.nonce, self.hash, self.hash_scheme,
+        )
 
-    def to_dict(self):
-        
-        return {
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce,
-            "hash": self.hash,
-        }
+
+class ChainBlocks:
+    # List-like view over a Chain's BlockStore. Block objects are only
+    # created when a block is looked up, so a chain of millions of blocks
+    # doesn't keep millions of Python objects alive.
+
+    def __init__(self, store, hash_scheme=DEFAULT_SCHEME):
+        self._store = store
+        self._hash_scheme = hash_scheme
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self._store)))]
+        return Block.from_fields(*self._store.fields(position), self._hash_scheme)
+
+    def __iter__(self):
+        fields = self._store.fields
+        for position in range(len(self._store)):
+            yield Block.from_fields(*fields(position), self._hash_scheme)
+
+    def append(self, block):
+        self._store.append(
+            block.index, block.timestamp, block.data,
+            block.previous_hash, block.nonce, block.hash,
+        )
 
 
 class Chain:
 
-    def __init__(self, genesis_data="Genesis Block"):
-        # The chain is just a Python list of Block objects
-        self.chain = []
+    def __init__(self, genesis_data="Genesis Block", checkpoint_interval=1000,
+                 checkpoint_key=None, hash_scheme=DEFAULT_SCHEME):
+        # checkpoint_key (bytes) signs the checkpoints is_valid() records.
+        # Without one, checkpoints are unsigned: they still catch an
+        # accidental rewrite of verified blocks, but anyone who can edit
+        # the chain can also edit them.
+        self._setup(BlockStore(), checkpoint_interval, checkpoint_key, hash_scheme)
 
         # When we create a new Chain, we immediately create
         # the first block (the "genesis" block)
         self.create_genesis_block(genesis_data)
 
+    def _setup(self, store, checkpoint_interval, checkpoint_key, hash_scheme):
+        # Every block of a chain is hashed with the same scheme
+        # (see block_hashing.py); check the name early
+        get_scheme(hash_scheme)
+        self.hash_scheme = hash_scheme
+
+        # Blocks are kept in compact column storage (see block_store.py).
+        # self.chain still behaves like a list of Block objects, but a
+        # Block is only built when you index or iterate it.
+        self._store = store
+        self.chain = ChainBlocks(self._store, hash_scheme)
+
+        # Merkle tree over the block hashes, so any single block can be
+        # proven with prove(index). It catches up with the chain lazily,
+        # when a root or proof is asked for, so appends don't pay for it.
+        self._merkle = MerkleTree()
+
+        # Secondary indexes on the payload fields (serial, GTIN, lot...),
+        # built on the first query and caught up on later ones
+        self.index = ChainIndex()
+
+        # Incremental validation state: blocks below _verified_height have
+        # already been checked by is_valid(), and _verified_hash is the hash
+        # of the last of them at the time it was checked.
+        self._verified_height = 1
+        self._verified_hash = None
+
+        # Every checkpoint_interval verified blocks we record a checkpoint
+        # (height + hash). With a secret checkpoint_key it is signed with
+        # HMAC-SHA256 so it can't be forged by whoever can edit the chain;
+        # without one its signature is None.
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_key = checkpoint_key or None
+        self.checkpoints = []
+
+    @classmethod
+    def open(cls, path, mmap=True, checkpoint_key=None):
+        # Load a chain saved with save(). With mmap=True the file is mapped
+        # and blocks are read on demand, so opening is instant whatever the
+        # size, but the chain is read-only. With mmap=False every block is
+        # copied into memory and the chain can be extended.
+        reader = LedgerReader(path, use_mmap=mmap)
+        metadata = reader.metadata
+
+        if mmap:
+            store = reader
+        else:
+            store = BlockStore()
+            for position in range(len(reader)):
+                store.append(*reader.fields(position))
+            reader.close()
+
+        chain = cls.__new__(cls)
+        chain._setup(
+            store,
+            metadata.get("checkpoint_interval", 1000),
+            checkpoint_key,
+            metadata.get("hash_scheme", DEFAULT_SCHEME),
+        )
+        # Checkpoints come from the file, so they are only trusted once
+        # verify_checkpoints() (or is_valid()) has checked them
+        chain.checkpoints = metadata.get("checkpoints", [])
+
+        # Reuse the saved indexes if they were saved with this ledger (same
+        # block count and same last block hash); otherwise they are rebuilt
+        # on the first query
+        index_path = path + ".idx"
+        if os.path.exists(index_path) and len(store):
+            index = ChainIndex.load(index_path)
+            if index.size == len(store) and index.tip_hash == store.hash_hex(-1):
+                chain.index = index
+        return chain
+
+    def save(self, path):
+        # Write the chain to a binary ledger file (see ledger_file.py)
+        with LedgerWriter(path) as writer:
+            fields = self._store.fields
+            for position in range(len(self._store)):
+                writer.write_block(*fields(position))
+            writer.close(metadata={
+                "checkpoint_interval": self.checkpoint_interval,
+                "checkpoints": self.checkpoints,
+                "hash_scheme": self.hash_scheme,
+            })
+
+        # Secondary indexes go next to the ledger, so opening it later
+        # doesn't have to scan every block to rebuild them
+        self._sync_index()
+        self.index.save(path + ".idx", tip_hash=self._store.hash_hex(-1))
+        return len(writer)
+
+    def drain(self, ledger_writer=None):
+        # Move every block but the last one out of memory, writing them to
+        # ledger_writer (a LedgerWriter) if given. Only the tip is kept, so
+        # extend_from_dataframe() carries on from it: calling this after
+        # each chunk builds a chain bigger than memory. Queries, proofs and
+        # validation only see the blocks still held, and the caller writes
+        # the tip itself before closing the ledger.
+        # Returns the number of blocks written.
+        store = self._store
+        fields = store.fields
+        count = len(store) - 1
+        if ledger_writer is not None:
+            for position in range(count):
+                ledger_writer.write_block(*fields(position))
+
+        tip = BlockStore()
+        tip.append(*fields(-1))
+        self._setup(tip, self.checkpoint_interval, self.checkpoint_key, self.hash_scheme)
+        return count
+
     def create_genesis_block(self, data):
         genesis_block = Block(
             index=0,
             data=data,
-            previous_hash="0"
+            previous_hash="0",
+            hash_scheme=self.hash_scheme,
         )
         self.chain.append(genesis_block)
         return genesis_block
@@ -78,38 +362,374 @@ class Chain:
         new_block = Block(
             index=new_index,
             data=data,
-            previous_hash=last_block.hash
+            previous_hash=last_block.hash,
+            hash_scheme=self.hash_scheme,
         )
 
         self.chain.append(new_block)
         return new_block
 
+    @classmethod
+    def from_dataframe(cls, df, columns, genesis_data="Genesis Block", writer=None,
+                       **kwargs):
+        # Build a whole chain straight from a pandas DataFrame.
+        # Columns that are missing from the frame are filled with "",
+        # the same as row.get(col, "") did in project.py.
+        # If a ChainJSONWriter is given, every block (genesis included) is
+        # written to it as soon as it is built.
+        # Extra keyword arguments are passed on to Chain().
+        chain = cls(genesis_data=genesis_data, **kwargs)
+        if writer is not None:
+            writer.write_block(chain.chain[0].to_dict())
+
+        chain.extend_from_dataframe(df, columns, writer)
+        return chain
+
+    def extend_from_dataframe(self, df, columns, writer=None):
+        # Append one block per DataFrame row, with the given columns as
+        # its payload (missing columns are filled with ""). Call it once
+        # per chunk to build a chain from a file that doesn't fit in
+        # memory. Returns the number of blocks added.
+        column_values = []
+        for col in columns:
+            if col in df.columns:
+                column_values.append(df[col].tolist())
+            else:
+                column_values.append([""] * len(df))
+
+        return self._extend_columns(list(columns), column_values, writer)
+
+    def extend_from_records(self, records, writer=None):
+        # Append one block per payload dictionary in one tight loop.
+        # New blocks are also written to writer (a ChainJSONWriter) if given.
+        # Returns the number of blocks added.
+        encode, algorithm = get_scheme(self.hash_scheme)
+        last_block = self.chain[-1]
+        index = last_block.index
+        previous_hash = last_block.hash
+        added = 0
+
+        for data in records:
+            index += 1
+            timestamp = time.time()
+            content = encode(index, timestamp, data, previous_hash, 0)
+            block_hash = algorithm(content).hexdigest()
+
+            self._store.append(index, timestamp, data, previous_hash, 0, block_hash)
+            if writer is not None:
+                writer.write_block(_block_dict(
+                    index, timestamp, data, previous_hash, 0, block_hash,
+                    self.hash_scheme,
+                ))
+            previous_hash = block_hash
+            added += 1
+
+        return added
+
+    def _extend_columns(self, columns, column_values, writer=None):
+        # Fast path for payloads that all have the same keys.
+        # With the default json-sha256 scheme, every payload's JSON starts
+        # with the same '{"data": {' prefix, so we hash that once and copy
+        # the hashlib state for each block. Other schemes use their own
+        # encoder (the struct encoding is already cheap).
+        default_scheme = self.hash_scheme == DEFAULT_SCHEME
+        scheme_encode, algorithm = get_scheme(self.hash_scheme)
+        order = sorted(range(len(columns)), key=lambda i: columns[i])
+        key_parts = [
+            ("" if n == 0 else ", ") + encode_string(columns[i]) + ": "
+            for n, i in enumerate(order)
+        ]
+        encode = encode_value
+        prefix = '{"data": {'
+        base_hash = hashlib.sha256(prefix.encode("utf-8"))
+
+        store = self._store
+        schema_id = store.schema_id(columns)
+        last_block = self.chain[-1]
+        index = last_block.index
+        previous_hash = last_block.hash
+
+        for values in zip(*column_values):
+            index += 1
+            timestamp = time.time()
+
+            if default_scheme:
+                parts = []
+                for key_part, i in zip(key_parts, order):
+                    value = values[i]
+                    if type(value) is str:
+                        parts.append(key_part + encode_string(value))
+                    else:
+                        parts.append(key_part + encode(value))
+
+                rest = (
+                    "".join(parts)
+                    + '}, "index": ' + str(index)
+                    + ', "nonce": 0, "previous_hash": ' + encode_string(previous_hash)
+                    + ', "timestamp": ' + encode(timestamp)
+                    + "}"
+                )
+                hash_object = base_hash.copy()
+                hash_object.update(rest.encode("utf-8"))
+                block_hash = hash_object.hexdigest()
+            else:
+                content = scheme_encode(
+                    index, timestamp, dict(zip(columns, values)), previous_hash, 0
+                )
+                block_hash = algorithm(content).hexdigest()
+
+            # All-string rows go straight into the payload columns
+            if all(type(value) is str for value in values):
+                store.append_values(
+                    index, timestamp, schema_id, values, previous_hash, 0, block_hash
+                )
+            else:
+                store.append(
+                    index, timestamp, dict(zip(columns, values)),
+                    previous_hash, 0, block_hash,
+                )
+            if writer is not None:
+                writer.write_block(_block_dict(
+                    index, timestamp, dict(zip(columns, values)),
+                    previous_hash, 0, block_hash, self.hash_scheme,
+                ))
+            previous_hash = block_hash
+
+        return len(column_values[0]) if column_values else 0
+
+    def _sync_index(self):
+        # Index every block appended since the last query
+        data = self._store.data
+        for position in range(self.index.size, len(self._store)):
+            self.index.add(position, data(position))
+
+    def _sync_merkle(self):
+        # Add a Merkle leaf for every block appended since the last call
+        hash_hex = self._store.hash_hex
+        for position in range(len(self._merkle), len(self._store)):
+            self._merkle.append(leaf_hash(hash_hex(position)))
+
+    def merkle_root(self):
+        self._sync_merkle()
+        return self._merkle.root()
+
+    def prove(self, index):
+        # Inclusion proof for one block: the block itself plus the sibling
+        # hashes on its path to the Merkle root. Check it with
+        # verify_proof(proof, chain.merkle_root()).
+        self._sync_merkle()
+        return {
+            "block": self.chain[index].to_dict(),
+            "path": self._merkle.path(index),
+            "size": len(self._merkle),
+        }
+
+    def _find(self, field, value):
+        self._sync_index()
+        return [self.chain[position] for position in self.index.lookup(field, value)]
+
+    def find_by_serial(self, serial):
+        return self._find("serial", serial)
+
+    def find_by_gtin(self, gtin):
+        return self._find("gtin", gtin)
+
+    def find_by_barcode(self, barcode_string):
+        return self._find("barcode_string", barcode_string)
+
+    def blocks_for_lot(self, lot):
+        return self._find("lot", lot)
+
+    def blocks_expiring_between(self, first=None, last=None):
+        # Blocks whose exp is between first and last (inclusive, either
+        # may be None), in chain order
+        self._sync_index()
+        return [self.chain[position] for position in self.index.range("exp", first, last)]
+
     def last_block(self):
         return self.chain[-1]
 
     def __len__(self):
         return len(self.chain)
 
-    def is_valid(self):
+    def is_valid(self, full=False):
+        # Only the blocks appended since the last successful call are
+        # re-hashed. Pass full=True to check every block again.
+        store = self._store
+
         # Chains with 0 or 1 block are automatically valid
-        if len(self.chain) <= 1:
+        if len(store) <= 1:
             return True
 
-        # Start from block 1 (the second block) and compare with previous
-        for i in range(1, len(self.chain)):
+        if full:
+            self._verified_height = 1
+            self._verified_hash = None
+            self.checkpoints = []
+
+        start = self._verified_height
+
+        # The last block we verified and every checkpoint must still have
+        # the same hash, otherwise the already-verified part was rewritten.
+        # This is one lookup per checkpoint, not a re-hash of old blocks.
+        if self._verified_hash is not None:
+            if store.hash_hex(start - 1) != self._verified_hash:
+                return False
+        if not self.verify_checkpoints():
+            return False
+        last_checkpoint = self.checkpoints[-1]["height"] if self.checkpoints else 0
+
+        # Compare every new block with the one before it
+        for i in range(start, len(store)):
             current = self.chain[i]
-            previous = self.chain[i - 1]
 
             # Check that the link is correct
-            if current.previous_hash != previous.hash:
+            if current.previous_hash != store.hash_hex(i - 1):
                 return False
 
             # Recompute the hash and compare
             if current.hash != current.compute_hash():
                 return False
 
-        # If all checks passed, the chain is valid
+            # Record a checkpoint every checkpoint_interval blocks
+            if (self.checkpoint_interval and i % self.checkpoint_interval == 0
+                    and i > last_checkpoint):
+                self.checkpoints.append(self._make_checkpoint(i, current.hash))
+
+        # If all checks passed, move the watermark to the end of the chain
+        self._verified_height = len(store)
+        self._verified_hash = store.hash_hex(-1)
         return True
 
+    def iter_verify(self, report=None):
+        # Check every block once (unlike is_valid(), don't stop at the first
+        # problem) and yield {"index": i, "error": ...} for each problem as
+        # soon as it is found. If a VerificationReport is given, it is
+        # filled in as we go.
+        store = self._store
+        counters = {}
+        started = time.perf_counter()
+
+        issues = _issues_in_range(
+            store, 1, len(store), counters=counters, hash_scheme=self.hash_scheme
+        )
+        for position, error in issues:
+            if report is not None:
+                if error == "broken_link":
+                    report.broken_links.append(position)
+                else:
+                    report.hash_mismatches.append(position)
+            yield {"index": position, "error": error}
+
+        if report is not None:
+            report.blocks_checked = max(len(store) - 1, 0)
+            report.bytes_hashed = counters.get("bytes_hashed", 0)
+            report.elapsed_seconds = time.perf_counter() - started
+
+    def verify(self):
+        # Single pass over the whole chain, returns a VerificationReport
+        report = VerificationReport()
+        for _ in self.iter_verify(report):
+            pass
+        return report
+
+    def validate_parallel(self, workers=None, shard_size=50000):
+        # Re-hash the whole chain on a pool of worker processes and return
+        # the sorted list of every failing block index (empty if valid).
+        # The store is copied once into shared memory (a chain opened from
+        # a ledger file is mapped by every worker instead); each worker
+        # checks hashes and links inside its shard, and the links between
+        # shards are checked here.
+        store = self._store
+        count = len(store)
+        workers = workers or os.cpu_count() or 1
+
+        # Block 0 (genesis) is not checked, same as is_valid()
+        shards = [
+            (start, min(start + shard_size, count))
+            for start in range(1, count, shard_size)
+        ]
+
+        if workers <= 1 or len(shards) <= 1:
+            results = [
+                _failing_in_range(store, start, end, self.hash_scheme)
+                for start, end in shards
+            ]
+        elif isinstance(store, LedgerReader):
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_open_worker_ledger,
+                initargs=(store.path, self.hash_scheme),
+            ) as pool:
+                starts, ends = zip(*shards)
+                results = list(pool.map(_worker_failing_in_range, starts, ends))
+        else:
+            shm, layout = store.to_shared_memory()
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_attach_worker_store,
+                    initargs=(shm.name, layout, self.hash_scheme),
+                ) as pool:
+                    starts, ends = zip(*shards)
+                    results = list(pool.map(_worker_failing_in_range, starts, ends))
+            finally:
+                shm.close()
+                shm.unlink()
+
+        failing = set()
+        for (start, end), shard_failing in zip(shards, results):
+            failing.update(shard_failing)
+            # Link continuity across the shard boundary
+            if store.previous_hash(start) != store.hash_hex(start - 1):
+                failing.add(start)
+        return sorted(failing)
+
+    @property
+    def verified_height(self):
+        # Number of blocks already checked by is_valid()
+        return self._verified_height
+
+    def _checkpoint_signature(self, height, block_hash):
+        # HMAC of the checkpoint, or None when the chain has no key
+        if self.checkpoint_key is None:
+            return None
+        message = f"{height}:{block_hash}".encode("utf-8")
+        return hmac.new(self.checkpoint_key, message, hashlib.sha256).hexdigest()
+
+    def _make_checkpoint(self, height, block_hash):
+        return {
+            "height": height,
+            "hash": block_hash,
+            "signature": self._checkpoint_signature(height, block_hash),
+        }
+
+    def _checkpoint_ok(self, checkpoint):
+        height = checkpoint["height"]
+        if height >= len(self._store):
+            return False
+        if self._store.hash_hex(height) != checkpoint["hash"]:
+            return False
+        # A chain with a key only accepts checkpoints signed with it, and
+        # one without a key can't check (so doesn't accept) signed ones
+        expected = self._checkpoint_signature(height, checkpoint["hash"])
+        signature = checkpoint.get("signature")
+        if expected is None or signature is None:
+            return expected is None and signature is None
+        return hmac.compare_digest(expected, signature)
+
+    def verify_checkpoints(self):
+        # Check every recorded checkpoint against the chain (one lookup per
+        # checkpoint, no re-hashing of blocks)
+        return all(self._checkpoint_ok(checkpoint) for checkpoint in self.checkpoints)
+
+    def write_json(self, path, indent=2):
+        # Stream the chain to a JSON file one block at a time, instead of
+        # json.dump(self.to_list(), ...) which builds every dict first
+        with ChainJSONWriter(path, indent=indent) as writer:
+            fields = self._store.fields
+            for position in range(len(self._store)):
+                writer.write_block(_block_dict(*fields(position), self.hash_scheme))
+        return writer.count
+
     def to_list(self):
         return [block.to_dict() for block in self.chain]
\ No newline at end of file
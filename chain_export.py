@@ -0,0 +1,52 @@
+import json
+
+
+class ChainJSONWriter:
+    """Write a chain to a JSON array one block at a time.
+
+    The output is the same list of block dictionaries that
+    json.dump(chain.to_list(), f, indent=2) produced, but only one block
+    is in memory at a time. With indent=None the blocks are written
+    compactly, one block per line.
+
+    Use it as a context manager so the closing "]" is always written:
+
+        with ChainJSONWriter("json1.json") as writer:
+            for block in chain.chain:
+                writer.write_block(block.to_dict())
+    """
+
+    def __init__(self, path, indent=2):
+        self.path = path
+        self.indent = indent
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+        if indent is None:
+            self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+            self._item_prefix = ""
+        else:
+            self._encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+            self._item_prefix = " " * indent
+
+    def write_block(self, block_dict):
+        text = self._encoder.encode(block_dict)
+        if self.indent is not None:
+            # Nest the block one level inside the list, like json.dump does
+            text = text.replace("\n", "\n" + self._item_prefix)
+
+        self._file.write("[\n" if self.count == 0 else ",\n")
+        self._file.write(self._item_prefix + text)
+        self.count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write("[]" if self.count == 0 else "\n]")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
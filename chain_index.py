@@ -0,0 +1,110 @@
+import json
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+# Payload fields indexed by exact value, and fields that also get a
+# sorted index for range queries (expiry dates like "2026-05-28" sort
+# correctly as strings)
+HASH_FIELDS = ("barcode_string", "gtin", "serial", "lot", "status")
+SORTED_FIELDS = ("exp",)
+
+
+class ChainIndex:
+    """Secondary indexes from payload values to block positions.
+
+    Each indexed field maps every value seen to the block positions
+    carrying it, in chain order: a plain int for a value seen once (most
+    serials and barcodes), an array("I") once it is seen again. Sorted
+    fields also keep their distinct values in a sorted list so a range of
+    values can be found with two binary searches. tip_hash is the hash of
+    the last indexed block when the index was saved with one.
+    """
+
+    def __init__(self, hash_fields=HASH_FIELDS, sorted_fields=SORTED_FIELDS):
+        self.hash_fields = tuple(hash_fields)
+        self.sorted_fields = tuple(sorted_fields)
+        self.size = 0
+        self.tip_hash = None
+        self._entries = {field: {} for field in self.hash_fields + self.sorted_fields}
+        self._sorted_values = {field: [] for field in self.sorted_fields}
+
+    def add(self, position, data):
+        # Index one block's payload. Blocks must be added in chain order.
+        if type(data) is dict:
+            for field, entries in self._entries.items():
+                value = data.get(field)
+                if type(value) is not str:
+                    continue
+                positions = entries.get(value)
+                if positions is None:
+                    entries[value] = position
+                    if field in self._sorted_values:
+                        insort(self._sorted_values[field], value)
+                elif type(positions) is int:
+                    entries[value] = array("I", (positions, position))
+                else:
+                    positions.append(position)
+        self.size = position + 1
+
+    def lookup(self, field, value):
+        # Positions of every block whose payload has field == value
+        positions = self._entries[field].get(value, ())
+        if type(positions) is int:
+            return [positions]
+        return list(positions)
+
+    def range(self, field, low=None, high=None):
+        # Positions of every block with low <= field <= high (either bound
+        # may be None), in chain order
+        values = self._sorted_values[field]
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        entries = self._entries[field]
+        positions = []
+        for value in values[start:end]:
+            value_positions = entries[value]
+            if type(value_positions) is int:
+                positions.append(value_positions)
+            else:
+                positions.extend(value_positions)
+        positions.sort()
+        return positions
+
+    def values(self, field):
+        # Every distinct value seen for a field
+        return list(self._entries[field])
+
+    def save(self, path, tip_hash=None):
+        # tip_hash: hash of the last indexed block, checked when the
+        # index is loaded back for a ledger
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "size": self.size,
+                "tip_hash": tip_hash,
+                "hash_fields": self.hash_fields,
+                "sorted_fields": self.sorted_fields,
+                "entries": {
+                    field: {
+                        value: positions if type(positions) is int else positions.tolist()
+                        for value, positions in entries.items()
+                    }
+                    for field, entries in self._entries.items()
+                },
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+
+        index = cls(saved["hash_fields"], saved["sorted_fields"])
+        index.size = saved["size"]
+        index.tip_hash = saved.get("tip_hash")
+        for field, entries in saved["entries"].items():
+            index._entries[field] = {
+                value: positions if type(positions) is int else array("I", positions)
+                for value, positions in entries.items()
+            }
+        for field in index.sorted_fields:
+            index._sorted_values[field] = sorted(index._entries[field])
+        return index
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import pickle
+
+import pandas as pd
+
+CACHE_DIR = ".dataset_cache"
+
+# Bump when the typed frame's layout changes, so old caches are rebuilt
+CACHE_VERSION = 1
+
+# Low-cardinality columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ("location", "gtin", "lot", "status")
+
+try:
+    import pyarrow  # noqa: F401 (Parquet support for pandas)
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+CACHE_EXTENSION = "parquet" if CACHE_FORMAT == "parquet" else "pkl"
+
+
+def file_digest(path):
+    # SHA-256 of a file's bytes, read in 1 MB chunks
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_frame(frame, path):
+    # Write to a temporary name first so a crash never leaves a
+    # half-written cache file behind
+    if CACHE_FORMAT == "parquet":
+        frame.to_parquet(path + ".tmp")
+    else:
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def read_frame(path):
+    if CACHE_FORMAT == "parquet":
+        return pd.read_parquet(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def read_transactions_csv(path):
+    # Parse the transactions CSV into the typed frame: every column as
+    # text (missing values as ""), the CATEGORICAL_COLUMNS as categoricals
+    # and timestamp also parsed into timestamp_dt
+    df = pd.read_csv(path, dtype=str, keep_default_na=False).fillna("")
+    df.columns = df.columns.str.strip()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "timestamp" in df.columns:
+        df["timestamp_dt"] = parse_timestamps(df["timestamp"])
+    return df
+
+
+def parse_timestamps(timestamps):
+    # One format for the whole column when it has one (fast). Otherwise
+    # every value is parsed on its own and unparseable ones become NaT,
+    # so a bad timestamp never stops the CSV from loading: project.py
+    # doesn't use timestamps, and the analytics skip NaT transits.
+    try:
+        return pd.to_datetime(timestamps)
+    except (ValueError, TypeError):
+        return pd.to_datetime(timestamps, format="mixed", errors="coerce")
+
+
+def _cache_paths(path, cache_dir):
+    # One cache file per CSV, named after it and its absolute path
+    path_key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    name = f"{os.path.splitext(os.path.basename(path))[0]}-{path_key}"
+    frame_path = os.path.join(cache_dir, f"{name}.{CACHE_EXTENSION}")
+    return frame_path, frame_path + ".json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _check_cache(path, cache_dir):
+    # (frame path, meta, digest): meta is None unless the cache matches
+    # the CSV. The CSV is only hashed when its mtime or size has changed,
+    # and a cache whose CSV was only touched is kept (with the new mtime).
+    frame_path, meta_path = _cache_paths(path, cache_dir)
+    stat = os.stat(path)
+    meta = _read_meta(meta_path)
+
+    if (meta is not None and meta.get("version") == CACHE_VERSION
+            and meta.get("format") == CACHE_FORMAT and os.path.exists(frame_path)):
+        if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+            return frame_path, meta, meta["sha256"]
+        digest = file_digest(path)
+        if meta["sha256"] == digest:
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_meta(meta_path, meta)
+            return frame_path, meta, digest
+        return frame_path, None, digest
+
+    return frame_path, None, None
+
+
+def csv_digest(path, cache_dir=CACHE_DIR):
+    # SHA-256 of the CSV, taken from the cache when the file is unchanged
+    _, _, digest = _check_cache(path, cache_dir)
+    return digest or file_digest(path)
+
+
+def load_transactions(path, cache_dir=CACHE_DIR, use_cache=True):
+    """Load the DSCSA transactions CSV as a typed frame.
+
+    The first load parses the CSV (see read_transactions_csv) and saves
+    the frame to cache_dir; later loads read the cached frame instead,
+    as long as the CSV's modification time and size (or, failing that,
+    its SHA-256) are unchanged.
+    """
+    if not use_cache:
+        return read_transactions_csv(path)
+
+    frame_path, meta, digest = _check_cache(path, cache_dir)
+    if meta is not None:
+        return read_frame(frame_path)
+
+    stat = os.stat(path)
+    df = read_transactions_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_frame(df, frame_path)
+    _write_meta(frame_path + ".json", {
+        "version": CACHE_VERSION,
+        "format": CACHE_FORMAT,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest or file_digest(path),
+    })
+    return df
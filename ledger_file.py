@@ -0,0 +1,258 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from block_store import HASH_SIZE, hex_to_digest
+
+# File layout
+# -----------
+#   file header      : magic, format version
+#   block records    : one per block, back to back
+#       record header: index, timestamp, nonce, flags, hash (32 raw bytes),
+#                      previous_hash (32 raw bytes), payload length
+#       payload      : block data as compact UTF-8 JSON
+#   metadata         : JSON object (checkpoints etc.)
+#   offset index     : file offset of every block record, uint64 each
+#   trailer          : block count, index offset, metadata offset/length, magic
+#
+# All integers are little-endian. Reading block N only needs the trailer,
+# one slot of the offset index and that block's record.
+
+FILE_MAGIC = b"PLEDGER1"
+TRAILER_MAGIC = b"PLIDXEND"
+FORMAT_VERSION = 1
+
+FILE_HEADER = struct.Struct("<8sH6x")
+RECORD_HEADER = struct.Struct("<QdqB%ds%dsI" % (HASH_SIZE, HASH_SIZE))
+TRAILER = struct.Struct("<QQQQ8s")
+
+# Set in a record's flags when some field doesn't fit the fixed header
+# (e.g. the genesis previous_hash "0"). The payload is then a JSON object
+# {"data": ..., <field>: <value>, ...} holding the raw values.
+FLAG_EXTRA = 0x01
+
+_PAYLOAD_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class LedgerWriter:
+    """Append blocks to a binary ledger file.
+
+    The offset index and trailer are written by close(). A new ledger is
+    written to path + ".tmp" and only moved over path by close(), so a
+    reader that still has the old file mapped keeps seeing the old file,
+    and a failed write leaves path untouched. Opening an existing ledger
+    with append=True drops its old index and continues after the last
+    block, in place.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        # Record offsets, 8 bytes each (the only per-block state kept)
+        self._offsets = array("Q")
+        self._metadata = {}
+        self._temp_path = None
+
+        if append:
+            with LedgerReader(path, use_mmap=False) as reader:
+                self._offsets = array(
+                    "Q", (reader.record_offset(i) for i in range(len(reader)))
+                )
+                self._metadata = reader.metadata
+                end = reader.data_end
+            self._file = open(path, "r+b")
+            self._file.seek(end)
+            self._file.truncate()
+        else:
+            self._temp_path = path + ".tmp"
+            self._file = open(self._temp_path, "wb")
+            self._file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def write_block(self, index, timestamp, data, previous_hash, nonce, hash):
+        flags = 0
+        extra = {}
+
+        if type(index) is not int or index < 0:
+            extra["index"] = index
+            index = 0
+        if type(timestamp) is not float:
+            extra["timestamp"] = timestamp
+            timestamp = 0.0
+        if type(nonce) is not int or not -(2 ** 63) <= nonce < 2 ** 63:
+            extra["nonce"] = nonce
+            nonce = 0
+
+        hash_digest = hex_to_digest(hash)
+        if hash_digest is None:
+            extra["hash"] = hash
+            hash_digest = bytes(HASH_SIZE)
+        previous_digest = hex_to_digest(previous_hash)
+        if previous_digest is None:
+            extra["previous_hash"] = previous_hash
+            previous_digest = bytes(HASH_SIZE)
+
+        if extra:
+            flags |= FLAG_EXTRA
+            extra["data"] = data
+            payload = _PAYLOAD_ENCODER.encode(extra).encode("utf-8")
+        else:
+            payload = _PAYLOAD_ENCODER.encode(data).encode("utf-8")
+
+        self._offsets.append(self._file.tell())
+        self._file.write(RECORD_HEADER.pack(
+            index, timestamp, nonce, flags, hash_digest, previous_digest, len(payload)
+        ))
+        self._file.write(payload)
+
+    def close(self, metadata=None):
+        # metadata defaults to what the file had before (when appending)
+        if self._file.closed:
+            return
+        if metadata is None:
+            metadata = self._metadata
+        meta_offset = self._file.tell()
+        meta = _PAYLOAD_ENCODER.encode(metadata).encode("utf-8")
+        self._file.write(meta)
+
+        index_offset = self._file.tell()
+        self._file.write(struct.pack("<%dQ" % len(self._offsets), *self._offsets))
+        self._file.write(TRAILER.pack(
+            len(self._offsets), index_offset, meta_offset, len(meta), TRAILER_MAGIC
+        ))
+        self._file.close()
+        if self._temp_path is not None:
+            os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        # Give up on a new ledger: drop the temporary file, keep path as it was
+        if self._file.closed:
+            return
+        self._file.close()
+        if self._temp_path is not None:
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self._temp_path is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class LedgerReader:
+    """Random access to the blocks of a binary ledger file.
+
+    With use_mmap=True the file is memory-mapped and nothing is parsed up
+    front: fields(n) reads block n's record straight from the mapping.
+    The reader has the same read methods as BlockStore, so a Chain can
+    use it as its (read-only) storage.
+    """
+
+    def __init__(self, path, use_mmap=True):
+        self.path = path
+        self._file = open(path, "rb")
+        if use_mmap:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = self._file.read()
+        view = memoryview(self._buffer)
+
+        magic, version = FILE_HEADER.unpack_from(view, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} is not a PharmaLedger ledger file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported ledger format version {version}")
+
+        count, index_offset, meta_offset, meta_length, magic = TRAILER.unpack_from(
+            view, len(view) - TRAILER.size
+        )
+        if magic != TRAILER_MAGIC:
+            raise ValueError(f"{path} has no offset index (was the writer closed?)")
+
+        self._count = count
+        self._offsets = view[index_offset:index_offset + 8 * count].cast("Q")
+        self.data_end = meta_offset
+        self.metadata = json.loads(str(view[meta_offset:meta_offset + meta_length], "utf-8"))
+        self._view = view
+
+    def __len__(self):
+        return self._count
+
+    def _position(self, position):
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("block index out of range")
+        return position
+
+    def record_offset(self, position):
+        return self._offsets[self._position(position)]
+
+    def _record(self, position):
+        offset = self._offsets[self._position(position)]
+        header = RECORD_HEADER.unpack_from(self._view, offset)
+        start = offset + RECORD_HEADER.size
+        return header, self._view[start:start + header[-1]]
+
+    def fields(self, position):
+        # (index, timestamp, data, previous_hash, nonce, hash), like BlockStore
+        (index, timestamp, nonce, flags, hash_digest, previous_digest,
+         _), payload = self._record(position)
+        data = json.loads(str(payload, "utf-8"))
+        block = (index, timestamp, data, previous_digest.hex(), nonce, hash_digest.hex())
+        if flags & FLAG_EXTRA:
+            extra = data
+            block = (
+                extra.get("index", index),
+                extra.get("timestamp", timestamp),
+                extra["data"],
+                extra.get("previous_hash", block[3]),
+                extra.get("nonce", nonce),
+                extra.get("hash", block[5]),
+            )
+        return block
+
+    def hash_digest(self, position):
+        offset = self._offsets[self._position(position)]
+        start = offset + RECORD_HEADER.size - 2 * HASH_SIZE - 4
+        return bytes(self._view[start:start + HASH_SIZE])
+
+    def hash_hex(self, position):
+        header, payload = self._record(position)
+        if header[3] & FLAG_EXTRA:
+            return self.fields(position)[5]
+        return header[4].hex()
+
+    def previous_hash(self, position):
+        header, payload = self._record(position)
+        if header[3] & FLAG_EXTRA:
+            return self.fields(position)[3]
+        return header[5].hex()
+
+    def data(self, position):
+        return self.fields(position)[2]
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError(f"{self.path} is opened read-only (use mmap=False to append)")
+
+    append = append_values = schema_id = _read_only
+
+    def close(self):
+        # Drop every view into the mapping before closing it
+        self._offsets.release()
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
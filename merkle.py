@@ -0,0 +1,96 @@
+import hashlib
+
+# Size of a SHA-256 digest in bytes
+NODE_SIZE = 32
+
+# Leaves and inner nodes are hashed with different prefixes, so an inner
+# node can never be passed off as a leaf (RFC 6962 style)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(block_hash):
+    # Merkle leaf for one block, from its hex hash string
+    return hashlib.sha256(LEAF_PREFIX + block_hash.encode("utf-8")).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    """Append-only Merkle tree over block hashes.
+
+    Every level of the tree is kept as one bytearray of 32-byte nodes, so
+    appending a leaf only recomputes the nodes on its path to the root
+    (O(log n)), and an inclusion proof is just the sibling of each of
+    those nodes. When a level has an odd number of nodes the last one is
+    carried up to the next level unchanged.
+    """
+
+    def __init__(self):
+        self._levels = [bytearray()]
+
+    def __len__(self):
+        return len(self._levels[0]) // NODE_SIZE
+
+    def _node(self, level, position):
+        start = position * NODE_SIZE
+        return bytes(self._levels[level][start:start + NODE_SIZE])
+
+    def append(self, leaf):
+        # Add a leaf digest (see leaf_hash) and update its path to the root
+        position = len(self)
+        self._levels[0] += leaf
+        node = leaf
+        level = 0
+
+        # Keep going up while this level still has more than one node
+        while len(self._levels[level]) > NODE_SIZE:
+            if position % 2 == 1:
+                node = node_hash(self._node(level, position - 1), node)
+            position //= 2
+            level += 1
+
+            if level == len(self._levels):
+                self._levels.append(bytearray())
+            nodes = self._levels[level]
+            start = position * NODE_SIZE
+            if start == len(nodes):
+                nodes += node
+            else:
+                nodes[start:start + NODE_SIZE] = node
+
+    def root(self):
+        # Hex root hash ("" for an empty tree)
+        if not self._levels[0]:
+            return ""
+        return self._levels[-1][:NODE_SIZE].hex()
+
+    def path(self, position):
+        # Sibling hashes from the leaf up to the root, as
+        # [("L" or "R", hex), ...] where the letter says which side
+        # the sibling is on
+        if not 0 <= position < len(self):
+            raise IndexError("leaf index out of range")
+
+        path = []
+        for level in range(len(self._levels) - 1):
+            sibling = position ^ 1
+            if sibling * NODE_SIZE < len(self._levels[level]):
+                side = "L" if sibling < position else "R"
+                path.append((side, self._node(level, sibling).hex()))
+            position //= 2
+        return path
+
+
+def verify_path(block_hash, path, root):
+    # True if the block hash and its sibling path lead to this root
+    node = leaf_hash(block_hash)
+    for side, sibling in path:
+        sibling = bytes.fromhex(sibling)
+        if side == "L":
+            node = node_hash(sibling, node)
+        else:
+            node = node_hash(node, sibling)
+    return node.hex() == root
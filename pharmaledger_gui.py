@@ -645,9 +645,9 @@ class PharmaLedgerGUI:
                               pady=10)
         btn_tamper.pack(fill='x', pady=(0, 8))
         
-        # ML Predictions
+        # Transit-time predictions
         btn_predict = tk.Button(content,
-                               text="🤖 ML Transit Predictions",
+                               text="📈 Transit Time Predictions",
                                command=self.run_predictions,
                                bg=self.colors['warning'],
                                fg='white',
@@ -986,7 +986,7 @@ class PharmaLedgerGUI:
         result = messagebox.askyesno(
             "Build Blockchain",
             "This will build a blockchain with 142,269 blocks.\n"
-            "Estimated time: 30-60 seconds.\n\n"
+            "Estimated time: a few seconds.\n\n"
             "Continue?"
         )
         if result:
@@ -1079,7 +1079,7 @@ class PharmaLedgerGUI:
         result = messagebox.askyesno(
             "Export Blockchain",
             "This will create a ~300 MB JSON file.\n"
-            "Estimated time: 60-90 seconds.\n\n"
+            "Estimated time: 10-20 seconds.\n\n"
             "Continue?"
         )
         if result:
@@ -1089,7 +1089,7 @@ class PharmaLedgerGUI:
                 return
             self.operation_running = True
             self.run_command(
-                "python project.py --build-chain --chain-output json1.json",
+                "python project.py --build-chain --chain-output json1.json --ledger-output json1.pledger",
                 "Exporting to JSON",
                 visualize=True
             )
@@ -1218,13 +1218,13 @@ exec(open('{script_name}').read())
             self.run_command("python tamper_measure.py", "Testing Tampering Detection", visualize=True)
             
     def run_predictions(self):
-        """Run ML predictions"""
+        """Run transit-time predictions"""
         if self.operation_running:
             messagebox.showwarning("Operation in Progress", "Please wait for the current operation to complete.")
             return
         
         self.operation_running = True
-        self.run_command("python predict_transit_time.py", "Running ML Predictions", visualize=True)
+        self.run_command("python predict_transit_time.py", "Running Transit Predictions", visualize=True)
         
     def view_results(self):
         """Open folder containing generated files"""
@@ -1,10 +1,20 @@
 import argparse
-import json
+import csv
 from pathlib import Path
 
 import pandas as pd
 
 from chain import Chain
+from chain_export import ChainJSONWriter
+from dataset_cache import load_transactions
+from ledger_file import LedgerWriter
+
+
+# These are the columns our script expects to exist
+REQUIRED_COLUMNS = ["barcode_string", "gtin", "serial", "exp", "lot", "status"]
+
+# Columns we put inside each block's data
+BLOCK_COLUMNS = ["barcode_string", "gtin", "serial", "lot", "exp", "status"]
 
 
 def load_units_csv(path="dscsa_transactions_2024_2025.csv"):
@@ -14,24 +24,52 @@ def load_units_csv(path="dscsa_transactions_2024_2025.csv"):
     if not file_path.exists():
         raise FileNotFoundError(f"CSV file not found: {file_path.resolve()}")
 
-    # Read the CSV file. We specify dtype=str so everything is read as text.
-    # keep_default_na=False and fillna("") so we don't get NaN values.
-    df = pd.read_csv(file_path, dtype=str, keep_default_na=False).fillna("")
+    # Load the typed frame (cached after the first run). Everything is
+    # text with "" for missing values (no NaN), and the low-cardinality
+    # columns are categoricals. We don't need the parsed timestamp here.
+    df = load_transactions(str(file_path)).drop(columns="timestamp_dt", errors="ignore")
 
-    # Remove leading/trailing spaces from column names, just in case
-    df.columns = df.columns.str.strip()
+    check_columns(df.columns, file_path)
+    return df
 
-    # These are the columns our script expects to exist
-    required_columns = ["barcode_string", "gtin", "serial", "exp", "lot", "status"]
 
+def check_columns(columns, file_path):
     # Check if any required column is missing
-    missing = [col for col in required_columns if col not in df.columns]
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
     if missing:
         raise ValueError(
             f"{file_path.name} is missing required columns: {missing}"
         )
 
-    return df
+
+def iter_units_csv(path="dscsa_transactions_2024_2025.csv", chunk_size=50000):
+    # The CSV as plain text frames of chunk_size rows each, read lazily so
+    # only one chunk is ever in memory. The header is checked up front.
+    file_path = Path(path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"CSV file not found: {file_path.resolve()}")
+
+    header = pd.read_csv(file_path, dtype=str, nrows=0).columns.str.strip()
+    check_columns(header, file_path)
+
+    reader = pd.read_csv(
+        file_path, dtype=str, keep_default_na=False, chunksize=chunk_size
+    )
+    return _clean_chunks(reader)
+
+
+def _clean_chunks(reader):
+    with reader:
+        for chunk in reader:
+            chunk = chunk.fillna("")
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+
+
+def count_csv_rows(path):
+    # Number of data rows, without loading them (blank lines don't count)
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)
 
 
 def main():
@@ -59,8 +97,37 @@ def main():
         help="If set, write the built chain to this JSON file",
     )
 
+    parser.add_argument(
+        "--ledger-output",
+        default=None,
+        help="If set, also save the built chain as a binary ledger file (.pledger)",
+    )
+
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write --chain-output without indentation (one block per line)",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the CSV in chunks instead of all at once (for very large files)",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=50000,
+        help="Rows per chunk with --stream",
+    )
+
     args = parser.parse_args()
 
+    if args.stream:
+        stream_units(args)
+        return
+
     # Try to load the CSV
     try:
         units = load_units_csv(args.path)
@@ -100,33 +167,155 @@ def main():
             "rows": len(units),
         }
 
-        chain = Chain(genesis_data=genesis_data)
+        # If the user also asked to save the chain to a file, open the
+        # writer first so blocks are streamed out while the chain is built
+        writer = None
+        if args.chain_output:
+            try:
+                writer = ChainJSONWriter(
+                    args.chain_output, indent=None if args.compact else 2
+                )
+            except Exception as e:
+                print("Error: could not write chain JSON.")
+                print("Details:", e)
+
+        # Build every block in one pass straight from the DataFrame columns
+        # (much faster than calling chain.add_block once per iterrows() row)
+        try:
+            chain = Chain.from_dataframe(
+                units, BLOCK_COLUMNS, genesis_data=genesis_data, writer=writer
+            )
+        except OSError as e:
+            print("Error: could not write chain JSON.")
+            print("Details:", e)
+            return
+        finally:
+            if writer is not None:
+                writer.close()
 
-        # These are the columns we put inside each block's data
-        block_columns = ["barcode_string", "gtin", "serial", "lot", "exp", "status"]
+        print(f"Chain built: {len(chain)} blocks")
 
-        # Loop over each row in the DataFrame and add a block
-        for _, row in units.iterrows():
-            # Turn the row into a simple dictionary
-            payload = {}
-            for col in block_columns:
-                # row[col] is a pandas Series, but we just want the value
-                payload[col] = row.get(col, "")
+        if writer is not None:
+            print(f"Wrote chain JSON to {args.chain_output}")
 
-            chain.add_block(payload)
+        # Binary ledger: random access to any block without parsing the file
+        if args.ledger_output:
+            try:
+                chain.save(args.ledger_output)
+                print(f"Wrote chain ledger to {args.ledger_output}")
+            except Exception as e:
+                print("Error: could not write chain ledger.")
+                print("Details:", e)
 
-        print(f"Chain built: {len(chain)} blocks")
 
-        # If the user also asked to save the chain to a file
+def stream_units(args):
+    # --stream: a single pass over the CSV, one chunk at a time. Barcodes
+    # are printed and blocks are streamed to --chain-output and
+    # --ledger-output as each chunk arrives, so the totals come last.
+    # Only the current chunk and the chain's tip block stay in memory.
+    try:
+        chunks = iter_units_csv(args.path, args.chunk_size)
+        # The genesis block records the row count, so count rows first
+        total_rows = count_csv_rows(args.path) if args.build_chain else None
+    except Exception as e:
+        print("Error: could not load CSV file.")
+        print("Details:", e)
+        return
+
+    print(f"Streaming {args.path} in chunks of {args.chunk_size} rows")
+
+    chain = None
+    writer = None
+    ledger = None
+    if args.build_chain:
+        # The genesis block will store basic info about the source
+        chain = Chain(genesis_data={
+            "source": Path(args.path).name,
+            "rows": total_rows,
+        })
+
         if args.chain_output:
-            output_path = args.chain_output
             try:
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(chain.to_list(), f, indent=2, ensure_ascii=False)
-                print(f"Wrote chain JSON to {output_path}")
+                writer = ChainJSONWriter(
+                    args.chain_output, indent=None if args.compact else 2
+                )
+                writer.write_block(chain.chain[0].to_dict())
             except Exception as e:
                 print("Error: could not write chain JSON.")
                 print("Details:", e)
+                writer = None
+
+        # Binary ledger: random access to any block without parsing the file
+        if args.ledger_output:
+            try:
+                ledger = LedgerWriter(args.ledger_output)
+            except Exception as e:
+                print("Error: could not write chain ledger.")
+                print("Details:", e)
+
+    columns_to_check = ["barcode_string", "gtin", "serial", "lot", "exp", "status"]
+    missing_counts = dict.fromkeys(columns_to_check, 0)
+    rows = 0
+    blocks = 1
+
+    try:
+        for chunk in chunks:
+            if rows == 0:
+                print("\nFirst 5 rows:")
+                print(chunk.head(5).to_string(index=False))
+                print("\nAll 2D Barcodes:")
+
+            for col in columns_to_check:
+                missing_counts[col] += int((chunk[col] == "").sum())
+
+            for i, code in enumerate(chunk["barcode_string"], start=rows + 1):
+                print(f"{i:02d}. {code}")
+            rows += len(chunk)
+
+            if chain is not None:
+                blocks += chain.extend_from_dataframe(chunk, BLOCK_COLUMNS, writer)
+                # Hand the chunk's blocks to the ledger and keep only the tip
+                chain.drain(ledger)
+    except Exception as e:
+        print("Error: could not stream CSV file.")
+        print("Details:", e)
+        if ledger is not None:
+            ledger.abort()
+        return
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"\nLoaded {rows} rows from {args.path}")
+    print("\nMissing values per column:")
+    for col in columns_to_check:
+        print(f"{col}: {missing_counts[col]}")
+
+    if chain is None:
+        return
+
+    print(f"\nChain built: {blocks} blocks")
+    if writer is not None:
+        print(f"Wrote chain JSON to {args.chain_output}")
+
+    if ledger is not None:
+        try:
+            tip = chain.last_block()
+            ledger.write_block(
+                tip.index, tip.timestamp, tip.data, tip.previous_hash, tip.nonce, tip.hash
+            )
+            # No .idx sidecar here: Chain.open() builds the indexes on the
+            # first query instead
+            ledger.close(metadata={
+                "checkpoint_interval": chain.checkpoint_interval,
+                "checkpoints": [],
+                "hash_scheme": chain.hash_scheme,
+            })
+            print(f"Wrote chain ledger to {args.ledger_output}")
+        except Exception as e:
+            ledger.abort()
+            print("Error: could not write chain ledger.")
+            print("Details:", e)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class RouteModelRegistry:
+    """One transit-time model per route: hours = intercept + slope * month.
+
+    Every route is fitted by ordinary least squares in closed form from
+    five grouped sums (n, sum x, sum y, sum xy, sum x^2), so fitting all
+    routes is one groupby rather than one regression object per route,
+    and gives the same predictions as sklearn's LinearRegression. The
+    sums are kept, so update() folds new transits into existing routes.
+    Only the parameters are needed to predict, so a registry saved with
+    save() answers predict() queries for any route and month without the
+    CSV or the transit frame.
+    """
+
+    def __init__(self):
+        # (from_location, to_location) -> (intercept, slope, transits)
+        self.models = {}
+        # (from_location, to_location) -> [n, sum_x, sum_y, sum_xy, sum_xx]
+        self.sums = {}
+        self._index = None
+
+    def __len__(self):
+        return len(self.models)
+
+    def fit(self, transit_df):
+        # Fit every route on a transit frame from scratch, regressing
+        # transit_time_hours on the month of from_timestamp
+        self.models = {}
+        self.sums = {}
+        return self.update(transit_df)
+
+    def update(self, transit_df):
+        # Add a frame of transits to the sums and refit the routes in it.
+        # Transits without a time (NaN hours or month) or without a
+        # location can't be fitted and are skipped.
+        transit_df = transit_df[
+            transit_df["transit_time_hours"].notna()
+            & transit_df["from_timestamp"].notna()
+            & transit_df["from_location"].notna()
+            & transit_df["to_location"].notna()
+        ]
+        month = transit_df["from_timestamp"].dt.month.to_numpy(dtype=float)
+        hours = transit_df["transit_time_hours"].to_numpy(dtype=float)
+        frame = pd.DataFrame({
+            "from_location": transit_df["from_location"].to_numpy(),
+            "to_location": transit_df["to_location"].to_numpy(),
+            "n": 1.0,
+            "x": month,
+            "y": hours,
+            "xy": month * hours,
+            "xx": month * month,
+        })
+        grouped = frame.groupby(["from_location", "to_location"], sort=False).sum()
+
+        for key, n, sum_x, sum_y, sum_xy, sum_xx in zip(
+            grouped.index, grouped["n"], grouped["x"], grouped["y"],
+            grouped["xy"], grouped["xx"],
+        ):
+            sums = self.sums.get(key)
+            if sums is None:
+                sums = self.sums[key] = [0.0, 0.0, 0.0, 0.0, 0.0]
+            sums[0] += n
+            sums[1] += sum_x
+            sums[2] += sum_y
+            sums[3] += sum_xy
+            sums[4] += sum_xx
+            self.models[key] = self._solve(*sums)
+
+        self._index = None
+        return self
+
+    @staticmethod
+    def _solve(n, sum_x, sum_y, sum_xy, sum_xx):
+        # (intercept, slope, transits) of the least-squares line. With a
+        # single distinct month the slope is 0 and the intercept the mean,
+        # as LinearRegression gives.
+        s_xx = sum_xx - sum_x * sum_x / n
+        s_xy = sum_xy - sum_x * sum_y / n
+        slope = s_xy / s_xx if s_xx > 0 else 0.0
+        intercept = (sum_y - slope * sum_x) / n
+        return float(intercept), float(slope), int(n)
+
+    def _arrays(self):
+        # Route index plus intercept / slope arrays, built once per fit
+        if self._index is None:
+            keys = list(self.models)
+            params = np.array([self.models[key][:2] for key in keys], dtype=float).reshape(-1, 2)
+            self._index = (
+                pd.MultiIndex.from_tuples(keys, names=["from_location", "to_location"]),
+                params[:, 0],
+                params[:, 1],
+            )
+        return self._index
+
+    def predict(self, from_locations, to_locations, months):
+        # Predicted hours for each (from, to, month) query, all at once.
+        # Scalars are broadcast against sequences (one route for many
+        # months, or one month for many routes); unknown routes give NaN.
+        from_locations, to_locations, months = np.broadcast_arrays(
+            np.asarray(from_locations, dtype=object),
+            np.asarray(to_locations, dtype=object),
+            np.asarray(months, dtype=float),
+        )
+        from_locations = np.atleast_1d(from_locations).ravel()
+        to_locations = np.atleast_1d(to_locations).ravel()
+        months = np.atleast_1d(months).ravel()
+
+        index, intercepts, slopes = self._arrays()
+        if len(index) == 0:
+            return np.full(len(months), np.nan)
+        positions = index.get_indexer(pd.MultiIndex.from_arrays([from_locations, to_locations]))
+        known = positions >= 0
+        predictions = np.full(len(positions), np.nan)
+        predictions[known] = intercepts[positions[known]] + slopes[positions[known]] * months[known]
+        return predictions
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "routes": [
+                    {
+                        "from_location": from_location,
+                        "to_location": to_location,
+                        "intercept": intercept,
+                        "slope": slope,
+                        "transits": transits,
+                    }
+                    for (from_location, to_location), (intercept, slope, transits)
+                    in self.models.items()
+                ],
+                "sums": [
+                    [from_location, to_location] + sums
+                    for (from_location, to_location), sums in self.sums.items()
+                ],
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+
+        registry = cls()
+        for route in saved["routes"]:
+            registry.models[(route["from_location"], route["to_location"])] = (
+                route["intercept"], route["slope"], route["transits"],
+            )
+        for from_location, to_location, *sums in saved.get("sums", []):
+            registry.sums[(from_location, to_location)] = sums
+        return registry
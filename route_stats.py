@@ -0,0 +1,332 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy (DDSketch style).
+
+    Values are counted in logarithmic buckets: bucket k holds values in
+    (gamma^(k-1), gamma^k] with gamma = (1 + a) / (1 - a), so any quantile
+    comes back within a relative error a of a true value. Two sketches
+    with the same accuracy merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def key(self, value):
+        # Bucket of a value's magnitude (value must be non-zero)
+        return math.ceil(math.log(abs(value)) / self._log_gamma)
+
+    def keys(self, values):
+        # Bucket of every value's magnitude, for an array of non-zero values
+        return np.ceil(np.log(np.abs(values)) / self._log_gamma).astype(np.int64)
+
+    def add(self, value, count=1):
+        if value > 0:
+            k = self.key(value)
+            self.positive[k] = self.positive.get(k, 0) + count
+        elif value < 0:
+            k = self.key(value)
+            self.negative[k] = self.negative.get(k, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def add_buckets(self, positive=(), negative=(), zero_count=0):
+        # Add (bucket, count) pairs counted elsewhere, e.g. with keys()
+        total = zero_count
+        for k, c in positive:
+            self.positive[k] = self.positive.get(k, 0) + c
+            total += c
+        for k, c in negative:
+            self.negative[k] = self.negative.get(k, 0) + c
+            total += c
+        self.zero_count += zero_count
+        self.count += total
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("can't merge sketches with different relative accuracy")
+        self.add_buckets(other.positive.items(), other.negative.items(), other.zero_count)
+
+    def _value(self, k):
+        # Representative value of bucket k (relative error <= accuracy)
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantile(self, q):
+        # Estimated q-quantile (0 <= q <= 1), None for an empty sketch
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # Negative values from the most negative up, then zeros, then positives
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.positive))
+
+    def values(self):
+        # Representative value of every non-empty bucket, ascending
+        values = [-self._value(k) for k in sorted(self.negative, reverse=True)]
+        if self.zero_count:
+            values.append(0.0)
+        values.extend(self._value(k) for k in sorted(self.positive))
+        return values
+
+    def to_dict(self):
+        return {
+            "positive": [[k, c] for k, c in sorted(self.positive.items())],
+            "negative": [[k, c] for k, c in sorted(self.negative.items())],
+            "zero_count": self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, saved, relative_accuracy):
+        sketch = cls(relative_accuracy)
+        sketch.add_buckets(saved["positive"], saved["negative"], saved["zero_count"])
+        return sketch
+
+
+class RouteStats:
+    """Running statistics of one route's transit times.
+
+    Count, mean and the sum of squared differences from the mean (m2) are
+    updated with Welford's method, so the variance never needs the raw
+    values; min, max and a QuantileSketch cover the box-plot numbers.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, hours):
+        self.count += 1
+        delta = hours - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (hours - self.mean)
+        self.min = min(self.min, hours)
+        self.max = max(self.max, hours)
+        self.sketch.add(hours)
+
+    def merge_moments(self, count, mean, m2, low, high):
+        # Fold in the count / mean / m2 / min / max of another batch of
+        # values (Chan et al.'s parallel form of Welford's update)
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def merge(self, other):
+        self.merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self):
+        # Sample variance, like pandas' .var() (NaN below two values)
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        # Sketch estimate, clamped to the exact min / max
+        value = self.sketch.quantile(q)
+        if value is None:
+            return math.nan
+        return min(max(value, self.min), self.max)
+
+    def whiskers(self, whis=1.5):
+        # Box-plot whisker ends as matplotlib's boxplot draws them: the
+        # lowest and highest values within whis * IQR of the box. Exact
+        # when min / max are in that range, sketch estimates otherwise.
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        if self.count == 0:
+            return math.nan, math.nan
+        low = q1 - whis * (q3 - q1)
+        high = q3 + whis * (q3 - q1)
+        within = [value for value in self.sketch.values() if low <= value <= high]
+
+        lower = self.min if self.min >= low else min(within or [q1])
+        upper = self.max if self.max <= high else max(within or [q3])
+        return min(max(lower, self.min), q1), max(min(upper, self.max), q3)
+
+
+class RouteStatsStore:
+    """Route statistics keyed by (from_location, to_location).
+
+    New transits are folded in with add() or add_transits() as they
+    arrive, so report() never rescans the transit history. Stores built
+    from different parts of the data (e.g. partitions, or days) merge
+    into one. Saved as JSON.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.routes = {}
+        self.transits = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def _route(self, from_location, to_location):
+        key = (from_location, to_location)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats(self.relative_accuracy)
+        return stats
+
+    def get(self, from_location, to_location):
+        # RouteStats of a route, or None if it has no transits yet
+        return self.routes.get((from_location, to_location))
+
+    def add(self, from_location, to_location, hours):
+        # Transits without a time (NaN hours) are skipped, as pandas'
+        # mean / quantile skip them
+        if math.isnan(hours):
+            return
+        self._route(from_location, to_location).add(hours)
+        self.transits += 1
+
+    def add_transits(self, transit_df):
+        # Fold in a frame of transit records (compute_transits() columns)
+        # with a few group-wise array operations instead of one add() per
+        # row. Transits without a time (NaN hours) or without a location
+        # are skipped.
+        transit_df = transit_df[
+            transit_df["transit_time_hours"].notna()
+            & transit_df["from_location"].notna()
+            & transit_df["to_location"].notna()
+        ]
+        if transit_df.empty:
+            return
+        hours = transit_df["transit_time_hours"].to_numpy(dtype=float)
+        frame = pd.DataFrame({
+            "from_location": transit_df["from_location"].to_numpy(),
+            "to_location": transit_df["to_location"].to_numpy(),
+            "hours": hours,
+        })
+        keys = ["from_location", "to_location"]
+
+        moments = frame.groupby(keys, sort=False)["hours"].agg(
+            ["count", "mean", "min", "max"]
+        )
+        # Sum of squared differences from each route's mean
+        frame["deviation"] = (hours - frame.groupby(keys, sort=False)["hours"].transform("mean")) ** 2
+        m2 = frame.groupby(keys, sort=False)["deviation"].sum()
+        for key, row in moments.iterrows():
+            self._route(*key).merge_moments(
+                int(row["count"]), row["mean"], m2[key], row["min"], row["max"]
+            )
+
+        # Sketch buckets, counted per route
+        sign = np.sign(hours)
+        nonzero = sign != 0
+        frame["bucket"] = 0
+        frame.loc[nonzero, "bucket"] = QuantileSketch(self.relative_accuracy).keys(hours[nonzero])
+        frame["sign"] = sign
+        buckets = frame.groupby(keys + ["sign", "bucket"], sort=False).size()
+        for (from_location, to_location, bucket_sign, bucket), count in buckets.items():
+            target = self.routes[(from_location, to_location)].sketch
+            if bucket_sign > 0:
+                target.add_buckets(positive=[(int(bucket), int(count))])
+            elif bucket_sign < 0:
+                target.add_buckets(negative=[(int(bucket), int(count))])
+            else:
+                target.add_buckets(zero_count=int(count))
+
+        self.transits += len(frame)
+
+    def merge(self, other):
+        for (from_location, to_location), stats in other.routes.items():
+            self._route(from_location, to_location).merge(stats)
+        self.transits += other.transits
+
+    def report(self):
+        # One row per route: count, mean, std, box-plot percentiles and
+        # whisker ends
+        rows = []
+        for (from_location, to_location), stats in self.routes.items():
+            lower_whisker, upper_whisker = stats.whiskers()
+            rows.append({
+                "route": f"{from_location} → {to_location}",
+                "from_location": from_location,
+                "to_location": to_location,
+                "count": stats.count,
+                "mean": stats.mean,
+                "std": stats.std,
+                "min": stats.min,
+                "p25": stats.quantile(0.25),
+                "median": stats.quantile(0.5),
+                "p75": stats.quantile(0.75),
+                "max": stats.max,
+                "lower_whisker": lower_whisker,
+                "upper_whisker": upper_whisker,
+            })
+        report = pd.DataFrame(rows, columns=[
+            "route", "from_location", "to_location", "count", "mean", "std",
+            "min", "p25", "median", "p75", "max", "lower_whisker", "upper_whisker",
+        ])
+        return report.sort_values(by=["count", "route"], ascending=[False, True]).reset_index(drop=True)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "relative_accuracy": self.relative_accuracy,
+                "transits": self.transits,
+                "routes": [
+                    {
+                        "from_location": from_location,
+                        "to_location": to_location,
+                        "count": stats.count,
+                        "mean": stats.mean,
+                        "m2": stats.m2,
+                        "min": stats.min,
+                        "max": stats.max,
+                        "sketch": stats.sketch.to_dict(),
+                    }
+                    for (from_location, to_location), stats in self.routes.items()
+                ],
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+
+        store = cls(saved["relative_accuracy"])
+        store.transits = saved["transits"]
+        for route in saved["routes"]:
+            stats = store._route(route["from_location"], route["to_location"])
+            stats.merge_moments(
+                route["count"], route["mean"], route["m2"], route["min"], route["max"]
+            )
+            stats.sketch = QuantileSketch.from_dict(route["sketch"], store.relative_accuracy)
+        return store
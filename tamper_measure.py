@@ -1,70 +1,416 @@
+import argparse
 import json
+import math
+import os
 import random
-import hashlib
-import copy
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 
-# Helper: compute block hash - Recreate the correct hash of a block
-def compute_hash(block):
-    block_string = (
-        str(block["index"])
-        + str(block["timestamp"])
-        + json.dumps(block["data"], sort_keys=True)
-        + str(block["previous_hash"])
-        + str(block["nonce"])
-    )
-    return hashlib.sha256(block_string.encode()).hexdigest()
+from block_hashing import DEFAULT_SCHEME
+from chain_export import ChainJSONWriter
+from ledger_file import LedgerReader
+from tamper_strategies import DEFAULT_STRATEGY, STRATEGIES, get_strategy
+from verification import find_mismatches
 
 # Validate chain: to detect errors
+# Hashes are recomputed exactly the way chain.py computed them when the
+# chain was exported, in one batch call over the whole chain
 def validate_chain(chain):
-    errors = []
-    for i, block in enumerate(chain):
-        recalculated_hash = compute_hash(block)
-        if recalculated_hash != block["hash"]:
-            errors.append({"index": block["index"], "error": "block_hash_mismatch"})
-    return errors
+    return [
+        {"index": chain[i]["index"], "error": "block_hash_mismatch"}
+        for i in find_mismatches(chain)
+    ]
+
+# Read-only list of block dicts backed by a memory-mapped ledger
+# (project.py --ledger-output). Nothing is parsed until a block is read,
+# and hash_at / previous_hash_at read just the fixed-size record header.
+class LedgerBlocks:
+    def __init__(self, path):
+        self.reader = LedgerReader(path, use_mmap=True)
+        self.hash_scheme = self.reader.metadata.get("hash_scheme", DEFAULT_SCHEME)
+        self.checkpoint_interval = self.reader.metadata.get("checkpoint_interval", 1000)
+
+    def __len__(self):
+        return len(self.reader)
+
+    def __getitem__(self, i):
+        index, timestamp, data, previous_hash, nonce, hash = self.reader.fields(i)
+        block = {
+            "index": index,
+            "timestamp": timestamp,
+            "data": data,
+            "previous_hash": previous_hash,
+            "nonce": nonce,
+            "hash": hash,
+        }
+        if self.hash_scheme != DEFAULT_SCHEME:
+            block["hash_scheme"] = self.hash_scheme
+        return block
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def hash_at(self, i):
+        return self.reader.hash_hex(i)
+
+    def previous_hash_at(self, i):
+        return self.reader.previous_hash(i)
+
+
+# Load the untampered base chain, shared read-only by every run
+def load_base_chain(path):
+    if path.endswith(".pledger"):
+        return LedgerBlocks(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Copy-on-write view of a tampered chain: reads fall through to the shared
+# base chain, and a block is only copied when a run edits it. Validation
+# only re-checks the edited blocks and the links into and out of them, so
+# a run costs as much as the number of blocks it tampers with.
+#
+# Deleting, inserting or reordering blocks switches the view to an explicit
+# order list, whose entries are base positions or inserted block dicts.
+class TamperedChain:
+    def __init__(self, base):
+        self.base = base
+        self.patches = {}
+        self.order = None
+        self.blocks_rehashed = 0
+
+    def __len__(self):
+        return len(self.base) if self.order is None else len(self.order)
+
+    def _entry(self, i):
+        # Base position (int) or inserted block (dict) at view position i
+        return i if self.order is None else self.order[i]
+
+    def __getitem__(self, i):
+        entry = self._entry(i)
+        if type(entry) is not int:
+            return entry
+        block = self.patches.get(entry)
+        return self.base[entry] if block is None else block
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # Get block i for editing (copied from the base the first time).
+    # Block dicts are copied two levels deep (the block and its data
+    # dict), which covers every field a tamper run edits.
+    def edit(self, i):
+        entry = self._entry(i)
+        if type(entry) is not int:
+            return entry
+        block = self.patches.get(entry)
+        if block is None:
+            block = dict(self.base[entry])
+            if isinstance(block["data"], dict):
+                block["data"] = dict(block["data"])
+            self.patches[entry] = block
+        return block
+
+    # Stored hash / previous_hash of block i, without decoding the whole
+    # block when the base can read them directly (LedgerBlocks)
+    def hash_at(self, i):
+        entry = self._entry(i)
+        if type(entry) is not int:
+            return entry["hash"]
+        block = self.patches.get(entry)
+        if block is not None:
+            return block["hash"]
+        if hasattr(self.base, "hash_at"):
+            return self.base.hash_at(entry)
+        return self.base[entry]["hash"]
+
+    def previous_hash_at(self, i):
+        entry = self._entry(i)
+        if type(entry) is not int:
+            return entry["previous_hash"]
+        block = self.patches.get(entry)
+        if block is not None:
+            return block["previous_hash"]
+        if hasattr(self.base, "previous_hash_at"):
+            return self.base.previous_hash_at(entry)
+        return self.base[entry]["previous_hash"]
+
+    def _ensure_order(self):
+        if self.order is None:
+            self.order = list(range(len(self.base)))
+        return self.order
+
+    # Remove the blocks at the given view positions
+    def delete(self, positions):
+        drop = set(positions)
+        order = self._ensure_order()
+        self.order = [entry for i, entry in enumerate(order) if i not in drop]
+
+    # Insert blocks, given as {view position: block}; each block goes
+    # right before the block currently at that position
+    def insert(self, blocks):
+        order = self._ensure_order()
+        new_order = []
+        for i, entry in enumerate(order):
+            if i in blocks:
+                new_order.append(blocks[i])
+            new_order.append(entry)
+        self.order = new_order
+
+    def swap(self, i, j):
+        order = self._ensure_order()
+        order[i], order[j] = order[j], order[i]
+
+    def _changed(self):
+        # View positions whose content may differ from the base block
+        # (must be re-hashed), and positions whose link must be re-checked
+        if self.order is None:
+            content = sorted(self.patches)
+            links = set()
+            for position in content:
+                links.add(position)
+                links.add(position + 1)
+        else:
+            content = []
+            links = set()
+            previous = None
+            for position, entry in enumerate(self.order):
+                if type(entry) is not int or entry in self.patches:
+                    content.append(position)
+                    links.add(position)
+                    links.add(position + 1)
+                elif type(previous) is not int or previous != entry - 1:
+                    links.add(position)
+                previous = entry
+        links.discard(0)
+        links = sorted(position for position in links if position < len(self))
+        return content, links
+
+    # Same errors validate_chain would report, assuming the base chain
+    # itself is valid: hash of every changed block, plus the links into
+    # and out of it. anchors is a list of (height, hash) pairs the
+    # verifier already trusts (see trusted_anchors); one that no longer
+    # matches is reported as "checkpoint_mismatch", like Chain.is_valid()
+    # rejecting a rewritten, already-verified part of the chain.
+    def validate(self, anchors=()):
+        content, links = self._changed()
+        self.blocks_rehashed = len(content)
+        errors = []
+
+        for position in find_mismatches([self[p] for p in content]):
+            position = content[position]
+            errors.append({
+                "index": self[position]["index"], "position": position,
+                "error": "block_hash_mismatch",
+            })
+
+        for position in links:
+            if self.previous_hash_at(position) != self.hash_at(position - 1):
+                errors.append({
+                    "index": self[position]["index"], "position": position,
+                    "error": "broken_link",
+                })
+
+        for height, expected in anchors:
+            if height >= len(self) or self.hash_at(height) != expected:
+                errors.append({
+                    "index": height, "position": height,
+                    "error": "checkpoint_mismatch",
+                })
+
+        return errors
+
+    def write_json(self, path, indent=2):
+        with ChainJSONWriter(path, indent=indent) as writer:
+            for block in self:
+                writer.write_block(block)
+
+    # Save only what differs from the base chain at base_path: the new
+    # values of every edited field (keyed by base position), plus the
+    # block order as base position ranges and inserted blocks when blocks
+    # were deleted, inserted or reordered. A few KB instead of a full copy.
+    def write_diff(self, path, base_path):
+        changes = {}
+        for position, block in sorted(self.patches.items()):
+            original = self.base[position]
+            changes[str(position)] = {
+                field: value for field, value in block.items()
+                if field not in original or original[field] != value
+            }
+
+        order = None
+        if self.order is not None:
+            order = []
+            for entry in self.order:
+                if type(entry) is not int:
+                    order.append({"block": entry})
+                elif order and type(order[-1]) is list and order[-1][1] == entry:
+                    order[-1][1] = entry + 1
+                else:
+                    order.append([entry, entry + 1])
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "base": os.path.abspath(base_path),
+                "base_length": len(self.base),
+                "base_tip": _base_hash(self.base, len(self.base) - 1),
+                "changes": changes,
+                "order": order,
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    # Rebuild a tampered view saved with write_diff(). base is the loaded
+    # base chain, or None to load the one named in the diff.
+    @classmethod
+    def load_diff(cls, path, base=None):
+        with open(path, "r", encoding="utf-8") as f:
+            diff = json.load(f)
+
+        if base is None:
+            # Diffs store an absolute base path; older ones a path relative
+            # to where they were written, tried next to the diff file too
+            base_path = diff["base"]
+            if not os.path.isabs(base_path) and not os.path.exists(base_path):
+                base_path = os.path.join(os.path.dirname(os.path.abspath(path)), base_path)
+            base = load_base_chain(base_path)
+        if (len(base) != diff["base_length"]
+                or _base_hash(base, len(base) - 1) != diff["base_tip"]):
+            raise ValueError(f"{path} was not made from this base chain")
+
+        view = cls(base)
+        for position, fields in diff["changes"].items():
+            view.patches[int(position)] = block = dict(base[int(position)])
+            block.update(fields)
+        if diff["order"] is not None:
+            view.order = []
+            for entry in diff["order"]:
+                if type(entry) is list:
+                    view.order.extend(range(entry[0], entry[1]))
+                else:
+                    view.order.append(entry["block"])
+        return view
+
+
+def _base_hash(base, i):
+    return base.hash_at(i) if hasattr(base, "hash_at") else base[i]["hash"]
+
+
+# Hashes a verifier holds after validating the base chain: one checkpoint
+# every checkpoint_interval blocks (as Chain.is_valid() records them) and
+# the hash of the last verified block
+def trusted_anchors(base, checkpoint_interval=1000):
+    heights = list(range(checkpoint_interval, len(base), checkpoint_interval))
+    if len(base) > 1 and (not heights or heights[-1] != len(base) - 1):
+        heights.append(len(base) - 1)
+    return [(height, _base_hash(base, height)) for height in heights]
+
+
+# Default chain to experiment on: the memory-mapped binary ledger when it
+# has been exported, otherwise the JSON export
+def default_chain_path():
+    return "json1.pledger" if os.path.exists("json1.pledger") else "json1.json"
+
+
+# Tamper with a random tamper_rate fraction of the blocks (never genesis)
+# on a copy-on-write view of base, using one of the tamper_strategies.
+# rng is anything with .sample() and .uniform(), e.g. the random module
+# or a seeded random.Random.
+def tamper_blocks(base, tamper_rate, rng=random, strategy=DEFAULT_STRATEGY):
+    total_blocks = len(base)
+    num_to_tamper = max(1, int(total_blocks * tamper_rate))
+
+    # Copy-on-write view: only the tampered blocks get copied
+    tampered_chain = TamperedChain(base)
+    tampered_indexes = get_strategy(strategy)(tampered_chain, num_to_tamper, rng)
+    return tampered_chain, tampered_indexes
+
+
+# Validate the tampered blocks and count how many tampered ones were caught
+def measure_detection(tampered_chain, tampered_indexes):
+    errors = tampered_chain.validate()
+
+    tampered_set = set(tampered_indexes)
+    detected_tampered = {
+        e["index"] for e in errors if e["error"] == "block_hash_mismatch" and e["index"] in tampered_set
+    }
+
+    detection_rate = len(detected_tampered) / len(tampered_indexes) * 100
+    return detected_tampered, detection_rate
+
+
+# Run one tamper strategy and the incremental validator on base, and
+# measure what the validator caught and how long it took
+def measure_strategy(base, strategy, tamper_rate, rng, anchors=()):
+    tampered_chain, tampered_indexes = tamper_blocks(base, tamper_rate, rng, strategy)
+
+    started = time.perf_counter()
+    errors = tampered_chain.validate(anchors)
+    validate_seconds = time.perf_counter() - started
+
+    # A tampered position counts as caught when an error points at it or
+    # at the link right after it (where a correctly re-hashed edit shows)
+    error_positions = {e["position"] for e in errors}
+    detected = sum(
+        1 for position in set(tampered_indexes)
+        if position in error_positions or position + 1 in error_positions
+    )
+    first_tampered = min(tampered_indexes) if tampered_indexes else None
+    first_error = min(error_positions) if error_positions else None
+
+    return {
+        "strategy": strategy,
+        "tampered": len(tampered_indexes),
+        "detected": detected,
+        "detection_rate": detected / len(tampered_indexes) * 100 if tampered_indexes else 0.0,
+        "flagged": bool(errors),
+        "errors": len(errors),
+        # How many blocks past the first tampered one the first error is
+        # reported (e.g. the next checkpoint, for a suffix rewrite)
+        "detection_distance": (
+            first_error - first_tampered
+            if first_error is not None and first_tampered is not None else None
+        ),
+        "blocks_rehashed": tampered_chain.blocks_rehashed,
+        "validate_seconds": validate_seconds,
+    }
+
 
 # simulation
-def run_experiments(runs=10):
-    ORIGINAL = "json1.json"
+# Where each run's tampered chain goes: "full" writes the whole chain to
+# tampered_runN.json, "diff" only the changes to tampered_runN.diff.json
+# (TamperedChain.load_diff rebuilds the chain), "none" writes nothing
+SINKS = ("full", "diff", "none")
+
+
+def run_experiments(runs=10, sink="full", path=None):
+    if sink not in SINKS:
+        raise ValueError(f"unknown sink {sink!r}, expected one of {list(SINKS)}")
+    ORIGINAL = path or default_chain_path()
 
-    # Load original chain
-    with open(ORIGINAL, "r") as f:
-        original_chain = json.load(f)
+    # Load original chain (shared by every run, never modified)
+    original_chain = load_base_chain(ORIGINAL)
 
     total_blocks = len(original_chain)
     print(f"Total blocks in chain: {total_blocks}")
 
+    # Runs only re-check the blocks they touch, so check the base once
+    base_errors = validate_chain(original_chain)
+    print(f"Errors in untampered chain: {len(base_errors)}")
+
     # Store summary results for line chart
     summary_results = []
 
     for run in range(1, runs + 1):
         # Randomize tamper rate 0.01% to 80%
         tamper_rate = random.uniform(0.0001, 0.8)
-        num_to_tamper = max(1, int(total_blocks * tamper_rate))
-
-        # Deep copy chain: create a fresh copy for tampering
-        tampered_chain = copy.deepcopy(original_chain)
-
-        # Randomly choose blocks to tamper
-        tampered_indexes = random.sample(range(1, total_blocks), num_to_tamper)
 
-        # Tamper blocks
-        for idx in tampered_indexes:
-            block = tampered_chain[idx]
-            if "serial" in block["data"]:
-                block["data"]["serial"] = "FAKE_" + block["data"]["serial"]
-            # Recompute hash incorrectly to simulate tampering
-            block["hash"] = compute_hash(block) + "_BAD"
-
-        # Validate chain to detect tampering
-        errors = validate_chain(tampered_chain)
-
-        detected_tampered = {
-            e["index"] for e in errors if e["error"] == "block_hash_mismatch" and e["index"] in tampered_indexes
-        }
+        tampered_chain, tampered_indexes = tamper_blocks(original_chain, tamper_rate)
 
-        detection_rate = len(detected_tampered) / len(tampered_indexes) * 100
+        # Validate the tampered blocks to detect tampering
+        detected_tampered, detection_rate = measure_detection(tampered_chain, tampered_indexes)
 
         print(f"\n=== Running tamper rate {tamper_rate*100:.2f}% ===")
         print(f"Tampered blocks: {len(tampered_indexes)}")
@@ -72,10 +418,14 @@ def run_experiments(runs=10):
         print(f"Detection rate: {detection_rate:.2f}%")
 
         # Save tampered chain JSON
-        out_name = f"tampered_run{run}.json"
-        with open(out_name, "w") as f_out:
-            json.dump(tampered_chain, f_out, indent=2)
-        print(f"Saved: {out_name}")
+        if sink == "full":
+            out_name = f"tampered_run{run}.json"
+            tampered_chain.write_json(out_name)
+            print(f"Saved: {out_name}")
+        elif sink == "diff":
+            out_name = f"tampered_run{run}.diff.json"
+            tampered_chain.write_diff(out_name, ORIGINAL)
+            print(f"Saved: {out_name}")
 
         # Store summary for line chart
         summary_results.append({
@@ -98,11 +448,157 @@ def run_experiments(runs=10):
     plt.show()
     print("Saved: detection_rate_chart.png")
 
+
 # --------------------------
-if __name__ == "__main__":
-    run_experiments()
+# Monte-Carlo tamper study: many seeded runs on a process pool.
+# Every worker opens the base chain once (a .pledger base is memory-mapped,
+# so all workers share the same pages) and runs never write to disk.
+
+_study_base = None
+_study_anchors = ()
 
 
+def _init_study_worker(path, checkpoint_interval=None):
+    global _study_base, _study_anchors
+    _study_base = load_base_chain(path)
+    if checkpoint_interval is None:
+        checkpoint_interval = getattr(_study_base, "checkpoint_interval", 1000)
+    _study_anchors = trusted_anchors(_study_base, checkpoint_interval)
 
 
+def _study_run(task):
+    run, seed, tamper_rate, strategy = task
+    rng = random.Random(seed)
+    if tamper_rate is None:
+        # Randomize tamper rate 0.01% to 80%
+        tamper_rate = rng.uniform(0.0001, 0.8)
+
+    result = measure_strategy(_study_base, strategy, tamper_rate, rng, _study_anchors)
+    result.update({"run": run, "seed": seed, "tamper_fraction": tamper_rate})
+    return result
 
+
+# Run a tamper study and return one result dict per run, in run order.
+# tamper_rates=None draws a random rate per run; a list of rates runs
+# `runs` experiments at each rate (a grid sweep), for each of the given
+# tamper strategies. Each run gets its own seed drawn from `seed`, so
+# results don't depend on the worker count. The validator trusts a
+# checkpoint every checkpoint_interval blocks (default: the ledger's).
+def run_study(path, runs=1000, tamper_rates=None, seed=0, workers=None,
+              strategies=(DEFAULT_STRATEGY,), checkpoint_interval=None):
+    for strategy in strategies:
+        get_strategy(strategy)
+
+    master = random.Random(seed)
+    rates = [None] if tamper_rates is None else list(tamper_rates)
+    tasks = []
+    for strategy in strategies:
+        for tamper_rate in rates:
+            for _ in range(runs):
+                tasks.append((len(tasks) + 1, master.getrandbits(64), tamper_rate, strategy))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        _init_study_worker(path, checkpoint_interval)
+        return [_study_run(task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_study_worker,
+        initargs=(path, checkpoint_interval),
+    ) as pool:
+        return list(pool.map(_study_run, tasks, chunksize=chunksize))
+
+
+def _mean_ci(values):
+    # Mean and 95% confidence interval (normal approximation)
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    half_width = 1.96 * stdev / math.sqrt(len(values))
+    return mean, stdev, mean - half_width, mean + half_width
+
+
+# Mean detection rate with a 95% confidence interval, per strategy and
+# per tamper rate for a grid study (or over all runs for a random one),
+# plus how often the chain was flagged at all and what validation cost
+def summarize_study(results, by_rate=True):
+    groups = {}
+    for result in results:
+        key = (result["strategy"], result["tamper_fraction"] if by_rate else None)
+        groups.setdefault(key, []).append(result)
+
+    summary = []
+    for (strategy, tamper_rate), group in groups.items():
+        mean, stdev, ci_low, ci_high = _mean_ci([r["detection_rate"] for r in group])
+        distances = [r["detection_distance"] for r in group if r["detection_distance"] is not None]
+        summary.append({
+            "strategy": strategy,
+            "tamper_fraction": tamper_rate,
+            "runs": len(group),
+            "mean_detection_rate": mean,
+            "stdev": stdev,
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+            "flagged_rate": sum(r["flagged"] for r in group) / len(group) * 100,
+            "mean_detection_distance": statistics.fmean(distances) if distances else None,
+            "mean_blocks_rehashed": statistics.fmean(r["blocks_rehashed"] for r in group),
+            "mean_validate_ms": statistics.fmean(r["validate_seconds"] for r in group) * 1000,
+        })
+    summary.sort(key=lambda row: (row["strategy"], row["tamper_fraction"] or 0))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamper detection experiments.")
+    parser.add_argument("--chain", default=None, help="Chain to tamper (.pledger or .json)")
+    parser.add_argument("--study", action="store_true",
+                        help="Run a parallel Monte-Carlo study instead of 10 saved runs")
+    parser.add_argument("--runs", type=int, default=1000,
+                        help="Study runs (per strategy and tamper rate)")
+    parser.add_argument("--grid", type=float, nargs="+", default=None,
+                        help="Tamper rates to sweep, e.g. --grid 0.001 0.01 0.1 0.5")
+    parser.add_argument("--strategy", nargs="+", default=[DEFAULT_STRATEGY],
+                        choices=list(STRATEGIES),
+                        help="Tamper strategies to study (default: serial_prefix)")
+    parser.add_argument("--checkpoint-interval", type=int, default=None,
+                        help="Blocks between trusted checkpoints (default: the ledger's)")
+    parser.add_argument("--sink", choices=SINKS, default="full",
+                        help="What each saved run writes: the full tampered chain, "
+                             "a diff against the base chain, or nothing")
+    parser.add_argument("--seed", type=int, default=0, help="Study master seed")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    if not args.study:
+        run_experiments(sink=args.sink, path=args.chain)
+        return
+
+    path = args.chain or default_chain_path()
+    base_errors = validate_chain(load_base_chain(path))
+    print(f"Errors in untampered chain: {len(base_errors)}")
+
+    results = run_study(
+        path, args.runs, args.grid, args.seed, args.workers,
+        args.strategy, args.checkpoint_interval,
+    )
+    summary = summarize_study(results, by_rate=args.grid is not None)
+
+    print(f"\n=== Tamper study: {len(results)} runs, seed {args.seed} ===")
+    for row in summary:
+        label = "random" if row["tamper_fraction"] is None else f"{row['tamper_fraction']*100:.2f}%"
+        distance = row["mean_detection_distance"]
+        distance = "-" if distance is None else f"{distance:.1f}"
+        print(
+            f"{row['strategy']} @ {label}: {row['runs']} runs, "
+            f"flagged {row['flagged_rate']:.1f}%, "
+            f"mean detection {row['mean_detection_rate']:.2f}% "
+            f"(95% CI {row['ci_low']:.2f}-{row['ci_high']:.2f}), "
+            f"first error +{distance} blocks, "
+            f"{row['mean_blocks_rehashed']:.0f} blocks re-hashed in "
+            f"{row['mean_validate_ms']:.1f} ms"
+        )
+
+
+# --------------------------
+if __name__ == "__main__":
+    main()
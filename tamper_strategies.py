@@ -0,0 +1,131 @@
+from verification import block_hash
+
+# Tamper strategies for tamper_measure.py. Each one takes a copy-on-write
+# TamperedChain view, the number of blocks to tamper with and a random
+# generator, changes the view in place and returns the (final) positions
+# it altered. Genesis (position 0) is never touched.
+#
+# Apart from "serial_prefix", every strategy leaves the blocks it forges
+# with a hash that matches their content, the way a real attacker would.
+
+
+def _forge_payload(block):
+    # Change the serial number the way the original experiment did
+    data = block["data"]
+    if isinstance(data, dict) and "serial" in data:
+        data["serial"] = "FAKE_" + data["serial"]
+
+
+def serial_prefix(view, count, rng):
+    # The original experiment: edit the serial and store a hash that
+    # can't match (any validator catches this on the block itself)
+    positions = rng.sample(range(1, len(view)), count)
+    for position in positions:
+        block = view.edit(position)
+        _forge_payload(block)
+        block["hash"] = block_hash(block) + "_BAD"
+    return positions
+
+
+def payload_rehash(view, count, rng):
+    # Edit the payload and store its correct new hash. The block itself
+    # checks out; only the link from the next block breaks.
+    positions = rng.sample(range(1, len(view)), count)
+    for position in positions:
+        block = view.edit(position)
+        _forge_payload(block)
+        block["hash"] = block_hash(block)
+    return positions
+
+
+def relink(view, count, rng):
+    # Point a block's previous_hash two blocks back (cutting its real
+    # predecessor out of the chain) and rehash it
+    positions = rng.sample(range(2, len(view)), min(count, len(view) - 2))
+    for position in positions:
+        block = view.edit(position)
+        block["previous_hash"] = view.hash_at(position - 2)
+        block["hash"] = block_hash(block)
+    return positions
+
+
+def timestamp_shift(view, count, rng):
+    # Move a block up to a day back or forward in time and rehash it
+    positions = rng.sample(range(1, len(view)), count)
+    for position in positions:
+        block = view.edit(position)
+        block["timestamp"] += rng.uniform(-86400.0, 86400.0)
+        block["hash"] = block_hash(block)
+    return positions
+
+
+def delete_blocks(view, count, rng):
+    # Drop blocks. Returns the position that follows each gap afterwards
+    # (a gap at the very end has none; only the verified tip shows it).
+    deleted = sorted(rng.sample(range(1, len(view)), min(count, len(view) - 1)))
+    view.delete(deleted)
+    seams = sorted({position - shift for shift, position in enumerate(deleted)})
+    return [position for position in seams if position < len(view)]
+
+
+def insert_blocks(view, count, rng):
+    # Insert a forged copy of a block right before it, linked to the
+    # block in front and correctly hashed
+    positions = sorted(rng.sample(range(1, len(view)), count))
+    inserted = {}
+    for position in positions:
+        block = dict(view[position])
+        if isinstance(block["data"], dict):
+            block["data"] = dict(block["data"])
+        _forge_payload(block)
+        block["previous_hash"] = view.hash_at(position - 1)
+        block["hash"] = block_hash(block)
+        inserted[position] = block
+    view.insert(inserted)
+    return [position + shift for shift, position in enumerate(positions)]
+
+
+def reorder_blocks(view, count, rng):
+    # Swap blocks with their successor
+    positions = rng.sample(range(1, len(view) - 1), min(count, len(view) - 2))
+    for position in positions:
+        view.swap(position, position + 1)
+    return positions
+
+
+def suffix_rewrite(view, count, rng):
+    # Edit payloads, then re-link and rehash every block from the first
+    # edit to the tip so all links and hashes are consistent again. Only
+    # hashes the verifier remembers (checkpoints, the verified tip) can
+    # show this.
+    positions = rng.sample(range(1, len(view)), count)
+    for position in positions:
+        _forge_payload(view.edit(position))
+    for position in range(min(positions), len(view)):
+        block = view.edit(position)
+        block["previous_hash"] = view.hash_at(position - 1)
+        block["hash"] = block_hash(block)
+    return positions
+
+
+STRATEGIES = {
+    "serial_prefix": serial_prefix,
+    "payload_rehash": payload_rehash,
+    "relink": relink,
+    "timestamp_shift": timestamp_shift,
+    "delete": delete_blocks,
+    "insert": insert_blocks,
+    "reorder": reorder_blocks,
+    "suffix_rewrite": suffix_rewrite,
+}
+
+DEFAULT_STRATEGY = "serial_prefix"
+
+
+def get_strategy(name):
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown tamper strategy {name!r}, expected one of {list(STRATEGIES)}"
+        ) from None
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import struct
+
+import pandas as pd
+import pytest
+
+from block_hashing import DSCSA_FIELDS, HASH_SCHEMES, compute_block_hash, get_scheme
+from chain import Chain
+from verification import block_hash
+
+DSCSA_ROW = {
+    "barcode_string": "(01)00301(21)S1",
+    "gtin": "00301",
+    "serial": "Sé1",
+    "lot": "L1",
+    "exp": "2026-01-01",
+    "status": "in_transit",
+}
+
+
+def reference_json(index, timestamp, data, previous_hash, nonce):
+    return json.dumps({
+        "index": index,
+        "timestamp": timestamp,
+        "data": data,
+        "previous_hash": previous_hash,
+        "nonce": nonce,
+    }, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
+def reference_struct(index, timestamp, data, previous_hash, nonce):
+    # The layout documented in block_hashing.encode_struct
+    if type(data) is dict and set(data) == set(DSCSA_FIELDS):
+        strings = [previous_hash] + [data[field] for field in DSCSA_FIELDS]
+        tag = 1
+    else:
+        strings = [previous_hash, json.dumps(data, sort_keys=True, ensure_ascii=False)]
+        tag = 0
+    strings = [s.encode("utf-8") for s in strings]
+    return (
+        struct.pack("<qdqB", index, timestamp, nonce, tag)
+        + struct.pack("<%dI" % len(strings), *map(len, strings))
+        + b"".join(strings)
+    )
+
+
+REFERENCE_ENCODINGS = {"json": reference_json, "struct": reference_struct}
+REFERENCE_ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": lambda data: hashlib.blake2b(data, digest_size=32),
+}
+
+
+def reference_hash(scheme, *fields):
+    encoding, algorithm = scheme.split("-")
+    return REFERENCE_ALGORITHMS[algorithm](REFERENCE_ENCODINGS[encoding](*fields)).hexdigest()
+
+
+@pytest.mark.parametrize("scheme", sorted(HASH_SCHEMES))
+@pytest.mark.parametrize("data", [DSCSA_ROW, "Genesis Block", {"serial": "S1", "n": [1, None]}])
+def test_schemes_match_reference(scheme, data):
+    fields = (7, 1700000000.25, data, "ab" * 32, 0)
+    assert compute_block_hash(*fields, scheme) == reference_hash(scheme, *fields)
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError):
+        get_scheme("xml-md5")
+    with pytest.raises(ValueError):
+        Chain(hash_scheme="xml-md5")
+
+
+@pytest.mark.parametrize("scheme", sorted(HASH_SCHEMES))
+def test_chain_builders_use_the_scheme(scheme):
+    frame = pd.DataFrame([DSCSA_ROW, dict(DSCSA_ROW, serial="S2")])
+    chain = Chain.from_dataframe(frame, list(DSCSA_FIELDS), hash_scheme=scheme)
+    chain.extend_from_records([{"serial": "S3"}])
+    chain.add_block(dict(DSCSA_ROW, serial="S4"))
+
+    for block in chain.to_list():
+        fields = (block["index"], block["timestamp"], block["data"],
+                  block["previous_hash"], block["nonce"])
+        assert block["hash"] == reference_hash(scheme, *fields)
+        assert block_hash(block) == block["hash"]
+    assert chain.is_valid(full=True)
+    assert chain.verify().is_valid
+
+
+@pytest.mark.parametrize("scheme", sorted(HASH_SCHEMES))
+def test_ledger_round_trip_keeps_the_scheme(tmp_path, scheme):
+    path = str(tmp_path / "chain.pledger")
+    chain = Chain(hash_scheme=scheme)
+    chain.extend_from_records([DSCSA_ROW, dict(DSCSA_ROW, serial="S2")])
+    chain.save(path)
+
+    opened = Chain.open(path)
+    assert opened.hash_scheme == scheme
+    assert opened.to_list() == chain.to_list()
+    assert opened.verify().is_valid
+    assert opened.is_valid()
+
+
+def test_default_scheme_is_not_recorded_on_blocks():
+    assert "hash_scheme" not in Chain().to_list()[0]
+    assert Chain(hash_scheme="struct-blake2b").to_list()[0]["hash_scheme"] == "struct-blake2b"
@@ -0,0 +1,121 @@
+import hashlib
+import json
+
+import pandas as pd
+
+from chain import Chain
+from chain_export import ChainJSONWriter
+
+COLUMNS = ["barcode_string", "gtin", "serial", "lot", "exp", "status", "note"]
+
+
+def reference_hash(block):
+    # Block.compute_hash before any of the fast paths existed
+    content = json.dumps({
+        "index": block["index"],
+        "timestamp": block["timestamp"],
+        "data": block["data"],
+        "previous_hash": block["previous_hash"],
+        "nonce": block["nonce"],
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def assert_reference_chain(chain):
+    blocks = chain.to_list()
+    for previous, block in zip(blocks, blocks[1:]):
+        assert block["previous_hash"] == previous["hash"]
+    for block in blocks:
+        assert block["hash"] == reference_hash(block)
+
+
+FRAME = pd.DataFrame({
+    "barcode_string": ["(01)003(21)S1", 'quote " and \\ backslash', "tab\there"],
+    "gtin": ["00301", "Ünïcødé ✓", "日本語"],
+    "serial": ["S1", "line\nbreak", " sep"],
+    "lot": ["L1", "", "emoji 💊"],
+    "exp": ["2026-01-01", "2026-02-02", "2026-03-03"],
+    "status": ["in_transit", "dispensed", "received"],
+})
+
+
+def test_from_dataframe_matches_reference_hashes():
+    # "note" is missing from the frame and filled with ""
+    chain = Chain.from_dataframe(FRAME, COLUMNS)
+    assert len(chain) == 4
+    assert chain.chain[1].data["note"] == ""
+    assert_reference_chain(chain)
+
+
+def test_non_string_values_match_reference_hashes():
+    frame = pd.DataFrame({
+        "barcode_string": ["B1", "B2"],
+        "gtin": [301, 302],
+        "serial": [1.5, float("inf")],
+        "lot": [None, True],
+    })
+    chain = Chain.from_dataframe(frame, ["serial", "gtin", "lot", "barcode_string"])
+    assert_reference_chain(chain)
+    assert chain.chain[1].data == {"serial": 1.5, "gtin": 301, "lot": None, "barcode_string": "B1"}
+
+
+def test_extend_from_records_matches_reference_hashes():
+    chain = Chain()
+    records = [
+        {"serial": "S1", "nested": {"b": [1, 2.5, None], "a": "é"}},
+        {"z": "last", "a": 'x"y'},
+        "plain string payload",
+        {},
+    ]
+    assert chain.extend_from_records(records) == 4
+    assert [block.data for block in chain.chain[1:]] == records
+    assert_reference_chain(chain)
+
+
+def test_bulk_builders_match_add_block():
+    chain = Chain.from_dataframe(FRAME, COLUMNS)
+    chain.add_block({"serial": "after bulk"})
+    chain.extend_from_records([{"serial": "records"}])
+    chain.extend_from_dataframe(FRAME, COLUMNS)
+    assert len(chain) == 9
+    assert_reference_chain(chain)
+    assert chain.is_valid(full=True)
+
+
+def test_writer_gets_the_same_blocks(tmp_path):
+    path = tmp_path / "chain.json"
+    with ChainJSONWriter(str(path)) as writer:
+        chain = Chain.from_dataframe(FRAME, COLUMNS, writer=writer)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == chain.to_list()
+
+
+def test_drained_chunks_make_one_valid_ledger(tmp_path):
+    from ledger_file import LedgerWriter
+
+    frame = pd.DataFrame({
+        "serial": [str(i) for i in range(25)],
+        "lot": ["L%d" % (i % 3) for i in range(25)],
+    })
+    path = str(tmp_path / "streamed.pledger")
+    chain = Chain(genesis_data={"rows": 25})
+    ledger = LedgerWriter(path)
+    written = 0
+    for start in range(0, 25, 10):
+        chain.extend_from_dataframe(frame.iloc[start:start + 10], ["serial", "lot"])
+        written += chain.drain(ledger)
+        # Only the tip is left in memory
+        assert len(chain) == 1
+
+    tip = chain.last_block()
+    ledger.write_block(
+        tip.index, tip.timestamp, tip.data, tip.previous_hash, tip.nonce, tip.hash
+    )
+    ledger.close(metadata={"hash_scheme": chain.hash_scheme})
+    assert written == 25
+
+    loaded = Chain.open(path)
+    assert len(loaded) == 26
+    assert loaded.is_valid(full=True)
+    assert [block.index for block in loaded.chain] == list(range(26))
+    assert loaded.find_by_serial("17")[0].data == {"serial": "17", "lot": "L2"}
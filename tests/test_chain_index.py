@@ -0,0 +1,81 @@
+from chain import Chain
+from chain_index import ChainIndex
+
+
+def _chain(count=12, lot="L"):
+    chain = Chain()
+    chain.extend_from_records(
+        {
+            "serial": f"S{i}",
+            "gtin": f"G{i % 3}",
+            "lot": f"{lot}{i % 2}",
+            "exp": f"2026-{i % 12 + 1:02d}-01",
+        }
+        for i in range(count)
+    )
+    return chain
+
+
+def _serials(blocks):
+    return [block.data["serial"] for block in blocks]
+
+
+def test_queries():
+    chain = _chain()
+    assert _serials(chain.find_by_serial("S4")) == ["S4"]
+    assert _serials(chain.find_by_gtin("G1")) == ["S1", "S4", "S7", "S10"]
+    assert _serials(chain.blocks_for_lot("L0")) == [f"S{i}" for i in range(0, 12, 2)]
+    assert chain.find_by_serial("missing") == []
+    assert _serials(chain.blocks_expiring_between("2026-03-01", "2026-05-01")) == ["S2", "S3", "S4"]
+    assert len(chain.blocks_expiring_between()) == 12
+
+
+def test_index_is_built_on_first_query_and_caught_up():
+    chain = _chain()
+    assert chain.index.size == 0
+    chain.find_by_serial("S0")
+    assert chain.index.size == len(chain)
+
+    chain.add_block({"serial": "S0", "gtin": "G9"})
+    assert chain.index.size == len(chain) - 1
+    assert [block.index for block in chain.find_by_serial("S0")] == [1, 13]
+    assert _serials(chain.find_by_gtin("G9")) == ["S0"]
+
+
+def test_values_seen_once_are_stored_as_positions():
+    index = ChainIndex()
+    index.add(0, {"serial": "A", "gtin": "G"})
+    index.add(1, {"serial": "B", "gtin": "G"})
+    assert index._entries["serial"]["A"] == 0
+    assert list(index._entries["gtin"]["G"]) == [0, 1]
+    assert index.lookup("serial", "B") == [1]
+    assert index.lookup("gtin", "G") == [0, 1]
+
+
+def test_saved_index_round_trip(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    chain = _chain()
+    chain.save(path)
+
+    opened = Chain.open(path)
+    assert opened.index.size == len(chain)
+    assert opened.index.tip_hash == chain.last_block().hash
+    assert _serials(opened.find_by_gtin("G2")) == ["S2", "S5", "S8", "S11"]
+
+
+def test_index_of_another_ledger_is_not_reused(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    other = str(tmp_path / "other.pledger")
+    _chain(lot="L").save(path)
+    _chain(lot="X").save(other)
+
+    # Same block count, different blocks
+    with open(other + ".idx", "rb") as f:
+        stale = f.read()
+    with open(path + ".idx", "wb") as f:
+        f.write(stale)
+
+    opened = Chain.open(path)
+    assert opened.index.size == 0
+    assert opened.blocks_for_lot("X0") == []
+    assert len(opened.blocks_for_lot("L0")) == 6
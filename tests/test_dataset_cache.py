@@ -0,0 +1,42 @@
+import pandas as pd
+
+from dataset_cache import load_transactions
+from project import load_units_csv
+
+CSV = (
+    "barcode_string,gtin,serial,lot,exp,status,location,timestamp\n"
+    "B1,G1,S1,L1,2026-01-01,in_transit,\"Boston, MA\",2024-01-01 00:00:00\n"
+    "B1,G1,S1,L1,2026-01-01,received,\"Dallas, TX\",not a date\n"
+    "B2,,S2,L1,2026-01-01,in_transit,,01/02/2024 10:30\n"
+)
+
+
+def test_bad_timestamps_still_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "units.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    units = load_units_csv(str(path))
+    assert len(units) == 3
+    assert "timestamp_dt" not in units.columns
+    assert units["timestamp"].tolist()[1] == "not a date"
+    # Blank cells are "" for the chain builder
+    assert units["gtin"].tolist()[2] == ""
+
+    df = load_transactions(str(path))
+    assert df["timestamp_dt"].tolist() == [
+        pd.Timestamp("2024-01-01 00:00:00"), pd.NaT, pd.Timestamp("2024-01-02 10:30:00"),
+    ]
+
+
+def test_cache_is_reused_and_refreshed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "units.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    first = load_transactions(str(path))
+    pd.testing.assert_frame_equal(load_transactions(str(path)), first)
+
+    path.write_text(CSV + "B3,G3,S3,L1,2026-01-01,dispensed,\"Memphis, TN\",2024-01-03 00:00:00\n",
+                    encoding="utf-8")
+    assert len(load_transactions(str(path))) == 4
@@ -0,0 +1,116 @@
+import pytest
+
+from chain import Block, Chain
+
+KEY = b"secret checkpoint key"
+
+
+def _chain(count=25, **kwargs):
+    chain = Chain(checkpoint_interval=10, **kwargs)
+    chain.extend_from_records({"serial": f"S{i}"} for i in range(count))
+    return chain
+
+
+def _replace(chain, position, fields):
+    # Swap the stored fields of one block, keeping every other block
+    store = chain._store
+    blocks = [store.fields(i) for i in range(len(store))]
+    blocks[position] = fields
+    store.__init__()
+    for block in blocks:
+        store.append(*block)
+
+
+def _rewrite(chain, position, serial):
+    # Replace a block with a correctly re-hashed copy whose payload has a
+    # different serial (its link to the block before is unchanged)
+    index, timestamp, data, previous_hash, nonce, _ = chain._store.fields(position)
+    forged = Block(index, dict(data, serial=serial), previous_hash, nonce, timestamp)
+    _replace(chain, position, (index, timestamp, forged.data, previous_hash, nonce, forged.hash))
+
+
+def test_watermark_and_checkpoints():
+    chain = _chain(checkpoint_key=KEY)
+    assert chain.verified_height == 1
+    assert chain.is_valid()
+    assert chain.verified_height == 26
+    assert [c["height"] for c in chain.checkpoints] == [10, 20]
+    assert all(c["signature"] for c in chain.checkpoints)
+
+    # Only the new blocks are checked, and checkpoints carry on from there
+    chain.extend_from_records({"serial": f"N{i}"} for i in range(10))
+    assert chain.is_valid()
+    assert chain.verified_height == 36
+    assert [c["height"] for c in chain.checkpoints] == [10, 20, 30]
+
+
+def test_new_bad_block_is_rejected():
+    chain = _chain()
+    assert chain.is_valid()
+    chain.add_block({"serial": "new"})
+    fields = list(chain._store.fields(26))
+    fields[2] = {"serial": "edited"}
+    _replace(chain, 26, tuple(fields))
+    assert not chain.is_valid()
+    assert chain.verified_height == 26
+
+
+def test_rewritten_verified_block_is_rejected_without_rehashing():
+    chain = _chain()
+    assert chain.is_valid()
+
+    # A re-hashed last block links correctly, so only the watermark hash
+    # recorded by the last check gives it away
+    _rewrite(chain, 25, "forged")
+    assert not chain.is_valid()
+    assert chain.verified_height == 26
+
+
+def test_rewritten_checkpointed_block_is_rejected():
+    chain = _chain(checkpoint_key=KEY)
+    assert chain.is_valid()
+    _rewrite(chain, 10, "forged")
+    assert not chain.verify_checkpoints()
+    assert not chain.is_valid()
+
+
+def test_forged_checkpoint_is_rejected():
+    chain = _chain(checkpoint_key=KEY)
+    assert chain.is_valid()
+    checkpoint = chain.checkpoints[0]
+    chain.checkpoints[0] = dict(checkpoint, signature="0" * 64)
+    assert not chain.is_valid()
+
+    # An unsigned checkpoint is not accepted by a chain with a key either
+    chain.checkpoints[0] = dict(checkpoint, signature=None)
+    assert not chain.verify_checkpoints()
+
+
+def test_unsigned_checkpoints_without_a_key():
+    chain = _chain()
+    assert chain.checkpoint_key is None
+    assert chain.is_valid()
+    assert [c["signature"] for c in chain.checkpoints] == [None, None]
+    assert chain.verify_checkpoints()
+
+    # A signed checkpoint can't be checked without the key
+    signed = _chain(checkpoint_key=KEY)
+    assert signed.is_valid()
+    chain.checkpoints = signed.checkpoints
+    assert not chain.verify_checkpoints()
+
+
+@pytest.mark.parametrize("key", [None, KEY])
+def test_checkpoints_survive_a_ledger_round_trip(tmp_path, key):
+    path = str(tmp_path / "chain.pledger")
+    chain = _chain(checkpoint_key=key)
+    assert chain.is_valid()
+    chain.save(path)
+
+    opened = Chain.open(path, checkpoint_key=key)
+    assert opened.checkpoints == chain.checkpoints
+    assert opened.verify_checkpoints()
+    assert opened.is_valid()
+
+    if key is not None:
+        assert not Chain.open(path, checkpoint_key=b"wrong key").is_valid()
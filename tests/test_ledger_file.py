@@ -0,0 +1,173 @@
+import os
+
+import pytest
+
+from chain import Chain
+from ledger_file import (
+    FILE_HEADER,
+    FILE_MAGIC,
+    FORMAT_VERSION,
+    RECORD_HEADER,
+    LedgerReader,
+    LedgerWriter,
+)
+
+HASH = "ab" * 32
+PREVIOUS = "cd" * 32
+
+
+def _chain(count=10):
+    chain = Chain(checkpoint_interval=4)
+    chain.extend_from_records(
+        {"serial": f"S{i}", "gtin": f"G{i % 3}", "exp": f"2026-0{i % 9 + 1}-01"}
+        for i in range(count)
+    )
+    return chain
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    chain = _chain()
+    assert chain.is_valid()
+    assert chain.save(path) == len(chain)
+
+    for mmap in (True, False):
+        opened = Chain.open(path, mmap=mmap)
+        assert opened.to_list() == chain.to_list()
+        assert opened.checkpoints == chain.checkpoints
+        assert opened.checkpoint_interval == 4
+        assert opened.verify().is_valid
+
+
+@pytest.mark.parametrize("block", [
+    (0, 1.5, "Genesis Block", "0", 0, HASH),
+    (-1, 2.0, {"a": 1}, PREVIOUS, 0, HASH),
+    (3, 7, {"a": 1}, PREVIOUS, 0, HASH),
+    (3, 2.5, {"a": 1}, PREVIOUS, 2 ** 70, HASH),
+    (3, 2.5, {"a": 1}, PREVIOUS, 0, "not-a-hash"),
+    (3, 2.5, {"a": "é", "b": [1, None]}, PREVIOUS, 5, HASH),
+])
+def test_extra_fields_round_trip(tmp_path, block):
+    # Values that don't fit the fixed record header go in the payload
+    path = str(tmp_path / "extra.pledger")
+    with LedgerWriter(path) as writer:
+        writer.write_block(*block)
+
+    with LedgerReader(path) as reader:
+        assert reader.fields(0) == block
+        assert reader.hash_hex(0) == block[5]
+        assert reader.previous_hash(0) == block[3]
+        assert reader.data(0) == block[2]
+
+
+def test_append(tmp_path):
+    path = str(tmp_path / "append.pledger")
+    with LedgerWriter(path) as writer:
+        writer.write_block(0, 1.0, "Genesis Block", "0", 0, HASH)
+        writer.close(metadata={"note": "kept"})
+
+    with LedgerWriter(path, append=True) as writer:
+        assert len(writer) == 1
+        writer.write_block(1, 2.0, {"serial": "S1"}, HASH, 0, PREVIOUS)
+
+    with LedgerReader(path) as reader:
+        assert len(reader) == 2
+        assert reader.metadata == {"note": "kept"}
+        assert reader.fields(1) == (1, 2.0, {"serial": "S1"}, HASH, 0, PREVIOUS)
+        assert reader.fields(-1) == reader.fields(1)
+        with pytest.raises(IndexError):
+            reader.fields(2)
+
+
+def test_opened_chain_can_be_extended_and_saved_again(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    _chain(5).save(path)
+
+    chain = Chain.open(path, mmap=False)
+    chain.add_block({"serial": "S5"})
+    chain.save(path)
+
+    reopened = Chain.open(path)
+    assert len(reopened) == 7
+    assert reopened.is_valid()
+
+
+def test_save_over_the_mapped_file(tmp_path):
+    path = str(tmp_path / "same.pledger")
+    _chain().save(path)
+
+    chain = Chain.open(path)
+    assert chain.is_valid()
+    expected = chain.to_list()
+    chain.save(path)
+
+    # The old mapping is still readable and the new file is complete
+    assert chain.to_list() == expected
+    assert Chain.open(path).to_list() == expected
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_failed_save_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    _chain(3).save(path)
+    with open(path, "rb") as f:
+        before = f.read()
+
+    with pytest.raises(RuntimeError):
+        with LedgerWriter(path) as writer:
+            writer.write_block(0, 1.0, "Genesis Block", "0", 0, HASH)
+            raise RuntimeError("stop")
+
+    with open(path, "rb") as f:
+        assert f.read() == before
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_edited_payload_is_detected(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    _chain().save(path)
+
+    with LedgerReader(path, use_mmap=False) as reader:
+        offset = reader.record_offset(6) + RECORD_HEADER.size
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        payload = f.read(16)
+        f.seek(offset)
+        f.write(payload.replace(b"S5", b"S9"))
+
+    report = Chain.open(path, mmap=False).verify()
+    assert report.hash_mismatches == [6]
+    assert report.broken_links == []
+
+
+def test_not_a_ledger(tmp_path):
+    path = tmp_path / "bad.pledger"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        LedgerReader(str(path))
+
+
+def test_ledger_without_trailer(tmp_path):
+    path = tmp_path / "open.pledger"
+    path.write_bytes(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION) + bytes(64))
+    with pytest.raises(ValueError):
+        LedgerReader(str(path))
+
+
+def test_validate_parallel_on_an_opened_ledger(tmp_path):
+    path = str(tmp_path / "chain.pledger")
+    chain = _chain(40)
+    chain.save(path)
+    assert Chain.open(path).validate_parallel(workers=2, shard_size=8) == []
+
+    with LedgerReader(path, use_mmap=False) as reader:
+        offset = reader.record_offset(17) + RECORD_HEADER.size
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        payload = f.read(16)
+        f.seek(offset)
+        f.write(payload.replace(b"S16", b"S99"))
+
+    opened = Chain.open(path)
+    assert opened.validate_parallel(workers=2, shard_size=8) == [17]
+    assert opened.validate_parallel(workers=1, shard_size=8) == [17]
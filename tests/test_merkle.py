@@ -0,0 +1,76 @@
+import pytest
+
+from chain import Chain, verify_proof
+from merkle import MerkleTree, leaf_hash, node_hash, verify_path
+
+
+def _tree(count):
+    tree = MerkleTree()
+    for i in range(count):
+        tree.append(leaf_hash(f"{i:064x}"))
+    return tree
+
+
+def _root(leaves):
+    # Reference root built level by level, carrying an odd last node up
+    if not leaves:
+        return ""
+    level = leaves
+    while len(level) > 1:
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0].hex()
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 4, 5, 7, 8, 9, 16, 33])
+def test_root_matches_level_by_level_build(count):
+    leaves = [leaf_hash(f"{i:064x}") for i in range(count)]
+    assert _tree(count).root() == _root(leaves)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13])
+def test_every_path_verifies(count):
+    tree = _tree(count)
+    root = tree.root()
+    for i in range(count):
+        assert verify_path(f"{i:064x}", tree.path(i), root)
+
+
+def test_path_rejects_other_leaf_and_tampered_sibling():
+    tree = _tree(9)
+    root = tree.root()
+    path = tree.path(4)
+    assert not verify_path(f"{5:064x}", path, root)
+
+    side, sibling = path[0]
+    flipped = ("0" if sibling[0] != "0" else "1") + sibling[1:]
+    assert not verify_path(f"{4:064x}", [(side, flipped)] + path[1:], root)
+
+
+def test_path_out_of_range():
+    with pytest.raises(IndexError):
+        _tree(3).path(3)
+
+
+def test_chain_proofs_after_appends():
+    chain = Chain()
+    chain.extend_from_records({"serial": str(i)} for i in range(20))
+    root = chain.merkle_root()
+    assert verify_proof(chain.prove(7), root)
+
+    # The tree catches up with blocks appended after the last root
+    chain.add_block({"serial": "late"})
+    new_root = chain.merkle_root()
+    assert new_root != root
+    assert verify_proof(chain.prove(21), new_root)
+    assert not verify_proof(chain.prove(21), root)
+
+
+def test_chain_proof_rejects_edited_block():
+    chain = Chain()
+    chain.extend_from_records({"serial": str(i)} for i in range(5))
+    proof = chain.prove(3)
+    proof["block"]["data"]["serial"] = "forged"
+    assert not verify_proof(proof, chain.merkle_root())
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib import cbook
+
+from route_stats import RouteStatsStore
+
+
+@pytest.fixture
+def transit_df():
+    rng = np.random.default_rng(0)
+    routes = [("A", "B"), ("B", "C"), ("C", "A")]
+    rows = []
+    for from_location, to_location in routes:
+        hours = np.concatenate([rng.uniform(1, 100, 300), [190.0, 250.0]])
+        rows.extend(
+            {"from_location": from_location, "to_location": to_location, "transit_time_hours": h}
+            for h in hours
+        )
+    return pd.DataFrame(rows)
+
+
+def test_report_matches_pandas_and_matplotlib(transit_df):
+    store = RouteStatsStore()
+    store.add_transits(transit_df)
+    report = store.report().set_index("route")
+
+    for (from_location, to_location), group in transit_df.groupby(["from_location", "to_location"]):
+        hours = group["transit_time_hours"].to_numpy()
+        row = report.loc[f"{from_location} → {to_location}"]
+        assert row["count"] == len(hours)
+        assert row["mean"] == pytest.approx(hours.mean())
+        assert row["std"] == pytest.approx(hours.std(ddof=1))
+        assert row["min"] == hours.min() and row["max"] == hours.max()
+
+        box = cbook.boxplot_stats(hours)[0]
+        for column, expected in [("p25", box["q1"]), ("median", box["med"]), ("p75", box["q3"]),
+                                 ("lower_whisker", box["whislo"]),
+                                 ("upper_whisker", box["whishi"])]:
+            assert row[column] == pytest.approx(expected, rel=0.03)
+
+
+def test_add_merge_and_save_agree(transit_df, tmp_path):
+    batch = RouteStatsStore()
+    batch.add_transits(transit_df)
+
+    one_by_one = RouteStatsStore()
+    for row in transit_df.itertuples():
+        one_by_one.add(row.from_location, row.to_location, row.transit_time_hours)
+
+    merged = RouteStatsStore()
+    for start in range(0, len(transit_df), 250):
+        part = transit_df.iloc[start:start + 250]
+        store = RouteStatsStore()
+        store.add_transits(part)
+        merged.merge(store)
+
+    path = str(tmp_path / "routes.json")
+    batch.save(path)
+    loaded = RouteStatsStore.load(path)
+
+    expected = batch.report()
+    for store in (one_by_one, merged, loaded):
+        assert store.transits == len(transit_df)
+        pd.testing.assert_frame_equal(store.report(), expected)
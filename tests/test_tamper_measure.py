@@ -0,0 +1,94 @@
+import os
+import random
+
+import pytest
+
+from chain import Chain
+from tamper_measure import LedgerBlocks, TamperedChain, trusted_anchors
+from tamper_strategies import STRATEGIES, get_strategy
+from verification import find_broken_links, find_mismatches
+
+
+@pytest.fixture(scope="module")
+def base_chain():
+    chain = Chain()
+    chain.extend_from_records(
+        {"serial": f"S{i}", "gtin": f"G{i % 5}", "lot": f"L{i % 7}"}
+        for i in range(200)
+    )
+    return chain
+
+
+@pytest.fixture(scope="module")
+def bases(base_chain, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("ledger") / "base.pledger")
+    base_chain.save(path)
+    return {"json": base_chain.to_list(), "pledger": LedgerBlocks(path)}
+
+
+def _full_errors(blocks):
+    # What a full validation of the materialized chain reports
+    return sorted(
+        [(position, "block_hash_mismatch") for position in find_mismatches(blocks)]
+        + [(position, "broken_link") for position in find_broken_links(blocks)]
+    )
+
+
+@pytest.mark.parametrize("base_kind", ["json", "pledger"])
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_incremental_validate_matches_full_validation(bases, base_kind, strategy):
+    base = bases[base_kind]
+    for seed in range(5):
+        rng = random.Random(seed)
+        view = TamperedChain(base)
+        count = max(1, int(len(base) * rng.uniform(0.001, 0.3)))
+        get_strategy(strategy)(view, count, rng)
+
+        incremental = sorted((e["position"], e["error"]) for e in view.validate())
+        assert incremental == _full_errors(list(view))
+        assert view.blocks_rehashed <= len(view)
+
+
+def test_untouched_view_has_no_errors(bases):
+    view = TamperedChain(bases["json"])
+    assert view.validate(trusted_anchors(bases["json"], 50)) == []
+    assert view.blocks_rehashed == 0
+
+
+def test_suffix_rewrite_is_caught_by_anchors(bases):
+    base = bases["json"]
+    view = TamperedChain(base)
+    get_strategy("suffix_rewrite")(view, 30, random.Random(1))
+
+    # The rewritten suffix is consistent on its own...
+    assert view.validate() == []
+    # ...but no longer matches the hashes the verifier trusted
+    errors = view.validate(trusted_anchors(base, 50))
+    assert errors
+    assert {e["error"] for e in errors} == {"checkpoint_mismatch"}
+
+
+
+@pytest.mark.parametrize("base_kind", ["json", "pledger"])
+def test_batch_check_in_parallel(bases, base_kind):
+    base = bases[base_kind]
+    view = TamperedChain(base)
+    tampered = get_strategy("serial_prefix")(view, 10, random.Random(2))
+
+    assert find_mismatches(base, workers=2, chunk_size=30) == []
+    assert find_mismatches(list(view), workers=2, chunk_size=30) == sorted(tampered)
+    assert find_mismatches(view, workers=2, chunk_size=30) == sorted(tampered)
+
+
+def test_diff_loads_its_base_from_another_directory(base_chain, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base_chain.save("base.pledger")
+    base = LedgerBlocks("base.pledger")
+    view = TamperedChain(base)
+    get_strategy("insert")(view, 5, random.Random(4))
+    view.write_diff("run.diff.json", "base.pledger")
+
+    os.mkdir("elsewhere")
+    monkeypatch.chdir("elsewhere")
+    loaded = TamperedChain.load_diff(os.path.join("..", "run.diff.json"))
+    assert list(loaded) == list(view)
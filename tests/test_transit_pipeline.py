@@ -0,0 +1,189 @@
+import csv
+import math
+
+import pandas as pd
+import pytest
+
+from route_models import RouteModelRegistry
+from route_stats import RouteStatsStore
+from transit_engine import compute_transits, iter_transits
+from transit_pipeline import TransitPipeline
+
+HEADER = ["barcode_string", "gtin", "serial", "lot", "exp", "status", "location", "timestamp"]
+
+
+def _row(barcode, serial, location, timestamp, gtin="G1", status="in_transit"):
+    return [barcode, gtin, serial, "L1", "2026-01-01", status, location, timestamp]
+
+
+ROWS = [
+    _row("B1", "S1", "Boston, MA", "2024-01-01 00:00:00"),
+    _row("B1", "", "Chicago, IL", "2024-01-01 10:00:00"),
+    _row("B1", "S1", "Dallas, TX", "2024-01-02 00:00:00", status="dispensed"),
+    # Two blank serials with different GTINs are not a reused serial
+    _row("B2", "", "Boston, MA", "2024-01-01 00:00:00", gtin="G2"),
+    _row("B2", "S2", "Memphis, TN", "2024-01-01 05:00:00", gtin="G2"),
+    _row("B3", "", "Boston, MA", "2024-01-03 00:00:00", gtin="G3"),
+    _row("B3", "S3", "Memphis, TN", "2024-01-03 02:00:00", gtin="G3"),
+    # Rows without a barcode never form a unit
+    _row("", "S4", "Boston, MA", "2024-01-01 00:00:00"),
+    _row("", "S5", "Chicago, IL", "2024-01-01 01:00:00"),
+    # A serial seen with two GTINs is dropped
+    _row("B6", "S6", "Boston, MA", "2024-01-01 00:00:00", gtin="G6"),
+    _row("B6", "S6", "Chicago, IL", "2024-01-01 03:00:00", gtin="G7"),
+]
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return _write_csv(tmp_path / "transactions.csv", ROWS)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_blank_serials_and_barcodes(csv_path, workers):
+    pipeline = TransitPipeline(csv_path, workers=workers)
+    transit_df = pipeline.run("transits")
+
+    assert pipeline.stats["invalid_serials"] == 1
+    assert pipeline.stats["continuous_barcodes"] == 3
+    assert list(transit_df["barcode"]) == ["B1", "B1", "B2", "B3"]
+    assert list(transit_df["transit_time_hours"]) == [10.0, 14.0, 5.0, 2.0]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_blank_locations_and_gtins(tmp_path, monkeypatch, workers):
+    monkeypatch.chdir(tmp_path)
+    path = _write_csv(tmp_path / "transactions.csv", [
+        _row("B1", "S1", "Boston, MA", "2024-01-01 00:00:00"),
+        _row("B1", "S1", "", "2024-01-01 04:00:00"),
+        _row("B1", "S1", "Dallas, TX", "2024-01-01 10:00:00"),
+        # A blank GTIN is not a second GTIN for S2
+        _row("B2", "S2", "Boston, MA", "2024-01-01 00:00:00", gtin=""),
+        _row("B2", "S2", "Dallas, TX", "2024-01-01 08:00:00"),
+    ])
+    pipeline = TransitPipeline(path, workers=workers)
+    transit_df = pipeline.run("transits")
+
+    assert pipeline.stats["invalid_serials"] == 0
+    assert pipeline.stats["continuous_barcodes"] == 2
+    # The transits into and out of the blank location have no route
+    assert transit_df["to_location"].isna().sum() == 1
+    assert transit_df["from_location"].isna().sum() == 1
+
+    report = pipeline.route_stats().report()
+    assert list(report["route"]) == ["Boston, MA → Dallas, TX"]
+    assert report["count"].tolist() == [1]
+    assert list(pipeline.route_models().models) == [("Boston, MA", "Dallas, TX")]
+
+
+def test_cached_run_gives_the_same_frame(csv_path):
+    first = TransitPipeline(csv_path).run("transits")
+    pipeline = TransitPipeline(csv_path)
+    assert pipeline.run("transits").equals(first)
+    assert pipeline.stats["transits"] == len(first)
+
+
+def test_stream_skips_blank_barcodes():
+    events = [
+        {"barcode_string": "", "location": "Boston, MA", "timestamp": "2024-01-01 00:00:00"},
+        {"barcode_string": "", "location": "Chicago, IL", "timestamp": "2024-01-01 01:00:00"},
+    ]
+    assert list(iter_transits(events)) == []
+
+
+def test_missing_timestamp_gives_nan_hours():
+    df = pd.DataFrame({
+        "barcode_string": ["B1", "B1", "B1", "B2", "B2"],
+        "location": ["Boston, MA", "Chicago, IL", "Dallas, TX", "Boston, MA", "Chicago, IL"],
+        "timestamp_dt": pd.to_datetime([
+            "2024-01-01 00:00:00", "2024-01-01 06:00:00", None,
+            "2024-01-01 00:00:00", "2024-01-02 00:00:00",
+        ]),
+    })
+    transit_df = compute_transits(df)
+    hours = transit_df["transit_time_hours"].tolist()
+    assert hours[0] == 6.0 and math.isnan(hours[1]) and hours[2] == 24.0
+
+    # Route statistics and models skip the transit without a time
+    store = RouteStatsStore()
+    store.add_transits(transit_df)
+    assert store.transits == 2
+    assert store.get("Chicago, IL", "Dallas, TX") is None
+    assert store.get("Boston, MA", "Chicago, IL").mean == 15.0
+
+    models = RouteModelRegistry().fit(transit_df)
+    assert ("Chicago, IL", "Dallas, TX") not in models.models
+    assert models.predict("Boston, MA", "Chicago, IL", 1)[0] == 15.0
+
+    events = [
+        {"barcode_string": "B1", "location": "Boston, MA", "timestamp": "2024-01-01 00:00:00"},
+        {"barcode_string": "B1", "location": "Chicago, IL", "timestamp": ""},
+    ]
+    stream_store = RouteStatsStore()
+    records = list(iter_transits(events, route_stats=stream_store))
+    assert math.isnan(records[0]["transit_time_hours"])
+    assert stream_store.transits == 0
+
+
+def _route_transits():
+    return pd.DataFrame({
+        "from_location": ["A", "A", "A", "B", "B"],
+        "to_location": ["X", "X", "X", "Y", "Y"],
+        "from_timestamp": pd.to_datetime([
+            "2024-01-05", "2024-02-05", "2024-03-05", "2024-01-05", "2024-04-05",
+        ]),
+        "transit_time_hours": [10.0, 12.0, 14.0, 5.0, 8.0],
+    })
+
+
+def test_predict_broadcasts_scalars_against_sequences():
+    models = RouteModelRegistry().fit(_route_transits())
+
+    # One route, many months
+    assert models.predict("A", "X", [1, 2, 3]).tolist() == [10.0, 12.0, 14.0]
+    # Many routes, one month
+    assert models.predict(["A", "B"], ["X", "Y"], 1).tolist() == [10.0, 5.0]
+    # Equal-length sequences and all-scalar queries still work
+    assert models.predict(["A", "B"], ["X", "Y"], [3, 4]).tolist() == [14.0, 8.0]
+    assert models.predict("B", "Y", 4).tolist() == [8.0]
+    assert math.isnan(models.predict("A", "Y", [1, 2])[1])
+    assert len(RouteModelRegistry().predict("A", "X", [1, 2, 3])) == 3
+
+
+def test_route_models_match_linear_regression():
+    # scikit-learn is only needed here, to check the closed-form fit
+    linear_model = pytest.importorskip("sklearn.linear_model")
+
+    rows = []
+    for route, (base, slope) in {("A", "X"): (20.0, 1.5), ("B", "Y"): (48.0, -2.0)}.items():
+        for month in range(1, 13):
+            for day in (3, 17):
+                hours = base + slope * month + (day % 7) * 0.25 - month % 3
+                rows.append((*route, "2024-%02d-%02d" % (month, day), hours))
+    # A route seen in a single month: slope 0, intercept = mean
+    rows += [("C", "Z", "2024-05-01", 7.0), ("C", "Z", "2024-05-09", 9.0)]
+    transit_df = pd.DataFrame(
+        rows, columns=["from_location", "to_location", "from_timestamp", "transit_time_hours"]
+    )
+    transit_df["from_timestamp"] = pd.to_datetime(transit_df["from_timestamp"])
+
+    models = RouteModelRegistry().fit(transit_df)
+    months = list(range(1, 13))
+    for (from_location, to_location), group in transit_df.groupby(
+        ["from_location", "to_location"]
+    ):
+        reference = linear_model.LinearRegression().fit(
+            group["from_timestamp"].dt.month.to_frame(), group["transit_time_hours"]
+        )
+        expected = reference.predict(pd.DataFrame({"from_timestamp": months}))
+        predicted = models.predict(from_location, to_location, months)
+        assert predicted == pytest.approx(expected)
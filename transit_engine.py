@@ -0,0 +1,160 @@
+import csv
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Columns of a transit record, in output order
+TRANSIT_COLUMNS = [
+    "barcode",
+    "from_location",
+    "to_location",
+    "from_timestamp",
+    "to_timestamp",
+    "transit_time_hours",
+]
+
+
+def continuous_route_mask(df):
+    """Boolean mask of the rows whose unit never returns to a location.
+
+    df must be sorted by barcode_string, then timestamp_dt. Consecutive
+    rows of a unit at the same location are collapsed to the first one,
+    so a unit that comes back to a location it already left shows up as
+    a repeated (barcode, location) pair among the remaining rows. Rows
+    without a barcode are never kept.
+    """
+    barcode = df["barcode_string"]
+    location = df["location"]
+
+    run_start = barcode.ne(barcode.shift()) | location.ne(location.shift())
+    runs = df.loc[run_start, ["barcode_string", "location"]]
+    returned = runs.loc[runs.duplicated(), "barcode_string"].unique()
+
+    return barcode.notna() & ~barcode.isin(returned)
+
+
+def compute_transits(df):
+    """Every move of a unit from one location to the next.
+
+    df must be sorted by barcode_string, then timestamp_dt. A transit is
+    any row whose previous row is the same unit at a different location,
+    so all transits come from comparing each row with the row before it
+    (shift()) instead of walking every group row by row. Rows come out in
+    the same order, with the same columns, as the original groupby +
+    iterrows loop produced.
+    """
+    barcode = df["barcode_string"]
+    location = df["location"]
+    time = df["timestamp_dt"]
+
+    previous_location = location.shift()
+    previous_time = time.shift()
+    moved = (
+        barcode.notna()
+        & barcode.eq(barcode.shift())
+        & location.ne(previous_location)
+    ).to_numpy()
+
+    from_time = previous_time.to_numpy()[moved]
+    to_time = time.to_numpy()[moved]
+    # Same arithmetic as Timedelta.total_seconds() / 3600 per record, and a
+    # missing timestamp (NaT) gives NaN hours, as total_seconds() did
+    seconds = (to_time - from_time) / np.timedelta64(1, "s")
+
+    return pd.DataFrame({
+        "barcode": barcode.to_numpy()[moved],
+        "from_location": previous_location.to_numpy()[moved],
+        "to_location": location.to_numpy()[moved],
+        "from_timestamp": from_time,
+        "to_timestamp": to_time,
+        "transit_time_hours": seconds / 3600,
+    }, columns=TRANSIT_COLUMNS)
+
+
+# Statuses after which a unit is not expected to move again
+TERMINAL_STATUSES = frozenset({"dispensed"})
+
+
+class TransitStream:
+    """Extract transits from a stream of time-ordered events.
+
+    Only the last location and time of each active unit is kept. A unit
+    that reaches a terminal status is dropped, so memory follows the
+    number of units in flight rather than the length of the history.
+    Events without a barcode are skipped, as in compute_transits().
+    Events are dicts with barcode_string, location, timestamp (a datetime
+    or an ISO string; a blank one gives NaN transit hours) and optionally
+    status. Transits come out as dicts
+    with the TRANSIT_COLUMNS keys, and are also added to route_stats (a
+    RouteStatsStore) if one is given.
+
+    Filters that need a unit's whole history (reused serials, continuous
+    routes) are not applied here.
+    """
+
+    def __init__(self, terminal_statuses=TERMINAL_STATUSES, route_stats=None):
+        self.terminal_statuses = frozenset(terminal_statuses)
+        self.route_stats = route_stats
+        self._last_seen = {}
+
+    @property
+    def active(self):
+        # Number of units currently tracked
+        return len(self._last_seen)
+
+    def add(self, event):
+        # Process one event; returns its transit record, or None
+        barcode = event["barcode_string"]
+        if barcode == "" or pd.isna(barcode):
+            return None
+        location = event["location"]
+        time = event["timestamp"]
+        if isinstance(time, str):
+            time = datetime.fromisoformat(time) if time else None
+
+        record = None
+        previous = self._last_seen.get(barcode)
+        if previous is not None and location != previous[0]:
+            from_location, from_time = previous
+            if time is None or from_time is None:
+                hours = math.nan
+            else:
+                hours = (time - from_time).total_seconds() / 3600
+            record = {
+                "barcode": barcode,
+                "from_location": from_location,
+                "to_location": location,
+                "from_timestamp": from_time,
+                "to_timestamp": time,
+                "transit_time_hours": hours,
+            }
+            if self.route_stats is not None:
+                self.route_stats.add(from_location, location, hours)
+
+        if event.get("status") in self.terminal_statuses:
+            self._last_seen.pop(barcode, None)
+        else:
+            self._last_seen[barcode] = (location, time)
+        return record
+
+    def extract(self, events):
+        # Generator of the transit records of an event stream
+        for event in events:
+            record = self.add(event)
+            if record is not None:
+                yield record
+
+
+def iter_transits(events, terminal_statuses=TERMINAL_STATUSES, route_stats=None):
+    # Shortcut for TransitStream(...).extract(events)
+    return TransitStream(terminal_statuses, route_stats).extract(events)
+
+
+def iter_csv_events(path):
+    # Events of a transactions CSV one row at a time, in file order (the
+    # file must already be in time order for transit extraction)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dataset_cache import CACHE_EXTENSION, csv_digest, load_transactions, read_frame, write_frame
+from route_models import RouteModelRegistry
+from route_stats import RouteStatsStore
+from transit_engine import compute_transits, continuous_route_mask
+
+CSV_FILE = "dscsa_transactions_2024_2025.csv"
+CACHE_DIR = ".transit_cache"
+
+# Bump when a stage's code changes what it outputs, so old caches are ignored
+CACHE_VERSION = 5
+
+# With workers=None, CSVs at least this big are processed in parallel
+PARALLEL_MIN_BYTES = 64 << 20
+
+
+# Columns the analytics group on, whose blank cells are NA as pd.read_csv
+# reads them by default: groupby skips NA, so a blank serial is never a
+# reused serial, a blank GTIN is not a second GTIN, rows without a
+# barcode never form a unit and a blank location never forms a route
+BLANK_AS_NA = ("serial", "barcode_string", "gtin", "location")
+
+
+def read_events(csv_path):
+    # The typed transactions frame (blank cells as "") with the
+    # BLANK_AS_NA columns' blanks turned back into NA
+    df = load_transactions(csv_path)
+    for col in BLANK_AS_NA:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if "" in df[col].cat.categories:
+                df[col] = df[col].cat.remove_categories([""])
+        else:
+            df[col] = df[col].mask(df[col] == "")
+    return df
+
+
+# --------------------------
+# Stages. Each takes the previous stage's frame (the CSV path for the
+# first one) and returns (frame, stats), where stats is a dict of counts
+# the scripts print.
+
+def load_events(csv_path):
+    df = read_events(csv_path)
+    df = df.sort_values(by=["barcode_string", "timestamp_dt"]).reset_index(drop=True)
+    return df, {"events": len(df)}
+
+
+def drop_reused_serials(df):
+    # A serial that appears with more than one GTIN is invalid serialization
+    gtins_per_serial = df.groupby("serial")["gtin"].nunique()
+    invalid_serials = gtins_per_serial.index[gtins_per_serial > 1]
+    df = df[~df["serial"].isin(invalid_serials)].copy()
+    return df, {"invalid_serials": len(invalid_serials)}
+
+
+def keep_continuous_routes(df):
+    continuous = continuous_route_mask(df)
+    df = df[continuous].copy()
+    return df, {"continuous_barcodes": df["barcode_string"].nunique()}
+
+
+def transits(df):
+    transit_df = compute_transits(df)
+    return transit_df, {"transits": len(transit_df)}
+
+
+# Named stages in pipeline order: (name, function, parameters)
+STAGES = [
+    ("events", load_events, {}),
+    ("valid_serials", drop_reused_serials, {}),
+    ("continuous_routes", keep_continuous_routes, {}),
+    ("transits", transits, {}),
+]
+
+
+# --------------------------
+# Partitioned execution. Events are hash-partitioned by serial: a barcode
+# contains its serial, so every event of a unit and every use of a serial
+# land in the same partition, and the serial-reuse check, continuous-route
+# check and transit extraction never need another partition. Every stat
+# is a count over disjoint partitions, so partition stats simply add up.
+
+def partition_ids(df, partitions):
+    # Partition number (0 .. partitions-1) of every row. A row with a
+    # blank serial goes with the other rows of its barcode.
+    serial = df["serial"]
+    if serial.isna().any():
+        serial = serial.fillna(df.groupby("barcode_string")["serial"].transform("first"))
+    hashes = pd.util.hash_pandas_object(serial.astype(str), index=False)
+    return hashes.to_numpy() % partitions
+
+
+def _run_partition(task):
+    # Run every stage after loading on one partition's events
+    events, stages = task
+    frame = events.sort_values(by=["barcode_string", "timestamp_dt"]).reset_index(drop=True)
+    stats = {"events": len(frame)}
+    for _, function, params in stages:
+        frame, stage_stats = function(frame, **params)
+        stats.update(stage_stats)
+    return frame, stats
+
+
+def run_partitioned(csv_path, stages, workers, partitions=None):
+    # Output of the last stage (and the summed stats), computed partition
+    # by partition on a process pool. Rows come out in the same order as
+    # the serial pipeline: by barcode, then by time.
+    df = read_events(csv_path)
+    partitions = partitions or workers
+    ids = partition_ids(df, partitions)
+    tasks = [(df[ids == part], stages) for part in range(partitions)]
+    del df
+
+    # Fork where we can: the analytics scripts run at module level, and
+    # spawned workers would re-run the whole script when importing it
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        results = list(pool.map(_run_partition, tasks))
+
+    stats = {}
+    for _, partition_stats in results:
+        for key, value in partition_stats.items():
+            stats[key] = stats.get(key, 0) + value
+
+    frame = pd.concat([result[0] for result in results], ignore_index=True)
+    key = "barcode" if "barcode" in frame.columns else "barcode_string"
+    frame = frame.sort_values(by=key, kind="stable").reset_index(drop=True)
+    return frame, stats
+
+
+class TransitPipeline:
+    """Load -> drop reused serials -> continuous-route filter -> transits.
+
+    The output of every stage is cached in cache_dir under a key made of
+    the CSV's SHA-256, the stage names and their parameters up to that
+    stage, so run() loads the furthest cached stage and only computes
+    what comes after it. A changed CSV gets new keys, and stale files are
+    simply never read again. stats holds the counts of every stage run
+    (or loaded) so far.
+
+    With workers > 1, a run of the whole pipeline from the CSV is split
+    into hash partitions on a process pool (see run_partitioned) and
+    only the last stage is cached. workers=None picks this for CSVs of
+    PARALLEL_MIN_BYTES or more, where it outweighs starting the pool.
+    """
+
+    def __init__(self, csv_path=CSV_FILE, cache_dir=CACHE_DIR, use_cache=True,
+                 stages=STAGES, workers=1):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.stages = list(stages)
+        self.workers = workers
+        self.stats = {}
+        self._keys = None
+
+    def _parallel_workers(self):
+        workers = self.workers
+        if workers is None:
+            if os.path.getsize(self.csv_path) < PARALLEL_MIN_BYTES:
+                return 1
+            if "fork" not in multiprocessing.get_all_start_methods():
+                return 1
+            workers = os.cpu_count() or 1
+        return workers
+
+    def stage_names(self):
+        return [name for name, _, _ in self.stages]
+
+    def _stage_keys(self):
+        # One cache key per stage, each covering every stage before it
+        if self._keys is None:
+            digest = hashlib.sha256(f"{CACHE_VERSION}:{csv_digest(self.csv_path)}".encode("utf-8"))
+            self._keys = []
+            for name, _, params in self.stages:
+                digest.update(json.dumps([name, params], sort_keys=True).encode("utf-8"))
+                self._keys.append(digest.hexdigest()[:32])
+        return self._keys
+
+    def _cache_path(self, position):
+        name = self.stages[position][0]
+        return os.path.join(self.cache_dir, f"{name}-{self._stage_keys()[position]}.{CACHE_EXTENSION}")
+
+    def _load(self, position):
+        path = self._cache_path(position)
+        if not (os.path.exists(path) and os.path.exists(path + ".json")):
+            return None
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            stats = json.load(f)
+        return read_frame(path), stats
+
+    def _save(self, position, frame, stats):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(position)
+        write_frame(frame, path)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+
+    def run(self, stage="transits"):
+        # Output frame of the named stage
+        names = self.stage_names()
+        if stage not in names:
+            raise ValueError(f"unknown stage {stage!r}, expected one of {names}")
+        target = names.index(stage)
+
+        # Start after the furthest cached stage, if any
+        frame, start = self.csv_path, 0
+        self.stats = {}
+        if self.use_cache:
+            for position in range(target, -1, -1):
+                cached = self._load(position)
+                if cached is not None:
+                    frame, self.stats = cached
+                    start = position + 1
+                    break
+
+        # The first stage loads the CSV, every later one runs per partition
+        workers = self._parallel_workers() if start == 0 and target > 0 else 1
+        if workers > 1:
+            frame, self.stats = run_partitioned(
+                self.csv_path, self.stages[1:target + 1], workers
+            )
+            if self.use_cache:
+                self._save(target, frame, self.stats)
+            return frame
+
+        for position in range(start, target + 1):
+            _, function, params = self.stages[position]
+            frame, stats = function(frame, **params)
+            self.stats.update(stats)
+            if self.use_cache:
+                self._save(position, frame, self.stats)
+
+        return frame
+
+    def _transits_sidecar(self, suffix, cls, build):
+        # Load a summary of the transits stage saved next to its cache
+        # file, or build it from the transit frame and save it there
+        transits_position = self.stage_names().index("transits")
+        path = os.path.splitext(self._cache_path(transits_position))[0] + suffix
+        if self.use_cache and os.path.exists(path):
+            return cls.load(path)
+
+        summary = build(self.run("transits"))
+        if self.use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            summary.save(path)
+        return summary
+
+    def route_stats(self):
+        # RouteStatsStore of the transits stage, cached next to it. New
+        # transits can be folded into it with add_transits() later on.
+        def build(transit_df):
+            store = RouteStatsStore()
+            store.add_transits(transit_df)
+            return store
+
+        return self._transits_sidecar(".routes.json", RouteStatsStore, build)
+
+    def route_models(self):
+        # RouteModelRegistry fitted on the transits stage, cached next to it
+        return self._transits_sidecar(
+            ".models.json", RouteModelRegistry,
+            lambda transit_df: RouteModelRegistry().fit(transit_df),
+        )
@@ -1,76 +1,17 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-CSV_FILE = "dscsa_transactions_2024_2025.csv" 
+from transit_pipeline import TransitPipeline
 
-df = pd.read_csv(CSV_FILE)
-df['timestamp_dt'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values(by=['barcode_string', 'timestamp_dt']).reset_index(drop=True)
+CSV_FILE = "dscsa_transactions_2024_2025.csv"
 
-
-# Remove invalid serialization
-dup_serials = (
-    df.groupby("serial")["gtin"]
-      .nunique()
-      .reset_index()
-)
-invalid_serials = dup_serials[dup_serials["gtin"] > 1]["serial"].tolist()
-print(f"Invalid reused serials removed: {len(invalid_serials)}")
-df = df[~df["serial"].isin(invalid_serials)].copy()
-
-# Keep only continuous routes
-def is_continuous_route(location_list):
-    """ Return False if route jumps BACK to a previous location """
-    visited = set()
-    last_loc = None
-    
-    for loc in location_list:
-        if last_loc is not None and loc != last_loc:
-            if loc in visited:
-                # This means the route returned to a past location → invalid
-                return False
-        visited.add(loc)
-        last_loc = loc
-    return True
-
-valid_barcodes = []
-
-for barcode, group in df.groupby("barcode_string"):
-    loc_seq = list(group["location"])
-    if is_continuous_route(loc_seq):
-        valid_barcodes.append(barcode)
-
-print(f"Barcodes after continuous-route filter: {len(valid_barcodes)}")
-
-df = df[df["barcode_string"].isin(valid_barcodes)].copy()
-
-# Compute transit times (location only and exclude same-location)
-transit_records = []
-
-for barcode, group in df.groupby("barcode_string"):
-    group = group.reset_index(drop=True)
-    
-    prev_location = None
-    prev_time = None
-
-    for i, row in group.iterrows():
-        loc = row["location"]
-        t = row["timestamp_dt"]
-
-        if prev_location is not None and loc != prev_location:
-            transit_records.append({
-                "barcode": barcode,
-                "from_location": prev_location,
-                "to_location": loc,
-                "from_timestamp": prev_time,
-                "to_timestamp": t,
-                "transit_time_hours": (t - prev_time).total_seconds() / 3600
-            })
-
-        prev_location = loc
-        prev_time = t
-
-transit_df = pd.DataFrame(transit_records)
+# Load CSV, remove invalid serialization, keep only continuous routes and
+# compute transit times (location only and exclude same-location). Stage
+# outputs are cached, so repeat runs load the transit frame directly, and
+# large CSVs are split across all cores.
+pipeline = TransitPipeline(CSV_FILE, workers=None)
+transit_df = pipeline.run("transits")
+print(f"Invalid reused serials removed: {pipeline.stats['invalid_serials']}")
+print(f"Barcodes after continuous-route filter: {pipeline.stats['continuous_barcodes']}")
 
 print("\nTransit records generated:", len(transit_df))
 
@@ -79,22 +20,40 @@ if transit_df.empty:
     raise SystemExit
 
 
-# Compute average per route
+# Route label, kept in the per-unit CSV
 transit_df["route"] = transit_df["from_location"] + " → " + transit_df["to_location"]
 
+# Per-route count, mean and box-plot percentiles from the route statistics
+# store, which is cached with the transit frame and updated incrementally,
+# so nothing here rescans the transits (report() is sorted by count)
+report = pipeline.route_stats().report()
+
+# Compute average per route
 avg_transit = (
-    transit_df.groupby("route")["transit_time_hours"]
-    .mean()
-    .sort_values()
+    report.set_index("route")["mean"]
+    .rename("transit_time_hours")
+    .sort_index()
+    .sort_values(kind="stable")
 )
 
 
 # Visualization: Top 10 most frequent routes with avg transit time and variability
-top_routes = transit_df['route'].value_counts().head(10).index.tolist()
-top_transit_df = transit_df[transit_df['route'].isin(top_routes)]
-route_order = transit_df['route'].value_counts().head(10).index
-avg_transit_top = top_transit_df.groupby('route')['transit_time_hours'].mean().reindex(route_order)
-box_data = [top_transit_df[top_transit_df['route'] == route]['transit_time_hours'].values for route in route_order]
+top_report = report.head(10).set_index("route")
+route_order = top_report.index
+avg_transit_top = top_report["mean"]
+
+# Box stats straight from the sketch percentiles and whisker ends
+box_stats = [
+    {
+        "label": route,
+        "med": row["median"],
+        "q1": row["p25"],
+        "q3": row["p75"],
+        "whislo": row["lower_whisker"],
+        "whishi": row["upper_whisker"],
+    }
+    for route, row in top_report.iterrows()
+]
 
 fig, ax1 = plt.subplots(figsize=(12,6))
 # Bar chart for average transit time
@@ -109,11 +68,11 @@ for bar in bars:
 
 # Box plot for variability
 ax2 = ax1.twinx()
-ax2.boxplot(box_data, positions=range(len(route_order)), widths=0.5,
-            patch_artist=True,
-            boxprops=dict(facecolor='lightgreen', alpha=0.5),
-            medianprops=dict(color='red'),
-            showfliers=False)
+ax2.bxp(box_stats, positions=range(len(route_order)), widths=0.5,
+        patch_artist=True,
+        boxprops=dict(facecolor='lightgreen', alpha=0.5),
+        medianprops=dict(color='red'),
+        showfliers=False)
 ax2.set_ylabel('Transit Time Variability (hours)')
 
 plt.title("Top 10 Most Frequent Routes: Average Transit Time & Variability")
@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from block_hashing import DEFAULT_SCHEME, get_scheme
+
+# Shared hash/link checks for both in-memory chains (chain.py) and exported
+# block dictionaries (tamper_measure.py, loaded JSON), so every tool
+# recomputes exactly the digest that Block.compute_hash produced.
+
+
+def block_hash(block):
+    # Recompute the hash of one exported block dictionary (Block.to_dict())
+    encode, algorithm = get_scheme(block.get("hash_scheme", DEFAULT_SCHEME))
+    content = encode(
+        block["index"], block["timestamp"], block["data"],
+        block["previous_hash"], block["nonce"],
+    )
+    return algorithm(content).hexdigest()
+
+
+def iter_issues(fields_at, hash_at, start, end, hash_scheme=DEFAULT_SCHEME,
+                check_first_link=True, counters=None):
+    # Yield (position, error) for every problem in [start, end):
+    # "broken_link" when previous_hash doesn't match the block before,
+    # "block_hash_mismatch" when the stored hash doesn't match the content.
+    # fields_at(i) gives (index, timestamp, data, previous_hash, nonce, hash)
+    # and hash_at(i) the stored hash of block i.
+    # If counters is a dict, the number of bytes hashed is added to it.
+    encode, algorithm = get_scheme(hash_scheme)
+    bytes_hashed = 0
+    for i in range(start, end):
+        index, timestamp, data, previous_hash, nonce, stored_hash = fields_at(i)
+
+        if (i > start or check_first_link) and previous_hash != hash_at(i - 1):
+            yield i, "broken_link"
+
+        content = encode(index, timestamp, data, previous_hash, nonce)
+        bytes_hashed += len(content)
+        if algorithm(content).hexdigest() != stored_hash:
+            yield i, "block_hash_mismatch"
+
+    if counters is not None:
+        counters["bytes_hashed"] = counters.get("bytes_hashed", 0) + bytes_hashed
+
+
+def _mismatches_in(blocks, offset):
+    # Positions (offset + i) of the blocks whose hash doesn't match
+    mismatches = []
+    schemes = {}
+    for i, block in enumerate(blocks):
+        name = block.get("hash_scheme", DEFAULT_SCHEME)
+        scheme = schemes.get(name)
+        if scheme is None:
+            scheme = schemes[name] = get_scheme(name)
+        encode, algorithm = scheme
+        try:
+            content = encode(
+                block["index"], block["timestamp"], block["data"],
+                block["previous_hash"], block["nonce"],
+            )
+        except (TypeError, ValueError):
+            # Fields of the wrong type can't be encoded, so can't match
+            mismatches.append(offset + i)
+            continue
+        if algorithm(content).hexdigest() != block["hash"]:
+            mismatches.append(offset + i)
+    return mismatches
+
+
+def find_mismatches(blocks, workers=1, chunk_size=20000):
+    # Batch check of a whole export: the positions of every block dict
+    # whose stored hash doesn't match its content, in order.
+    # With workers > 1 the list is split into chunks across processes.
+    if workers <= 1 or len(blocks) <= chunk_size:
+        return _mismatches_in(blocks, 0)
+
+    # blocks may be any sequence with len() and integer indexing (e.g.
+    # tamper_measure.LedgerBlocks), so only lists and tuples are sliced
+    offsets = range(0, len(blocks), chunk_size)
+    if isinstance(blocks, (list, tuple)):
+        chunks = [blocks[offset:offset + chunk_size] for offset in offsets]
+    else:
+        chunks = [
+            [blocks[i] for i in range(offset, min(offset + chunk_size, len(blocks)))]
+            for offset in offsets
+        ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_mismatches_in, chunks, offsets)
+    return [position for chunk in results for position in chunk]
+
+
+def find_broken_links(blocks):
+    # Positions of every block dict whose previous_hash doesn't match the
+    # hash of the block before it
+    return [
+        i for i in range(1, len(blocks))
+        if blocks[i]["previous_hash"] != blocks[i - 1]["hash"]
+    ]